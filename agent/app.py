@@ -119,9 +119,8 @@ def main():
         from agent_controller import (
             app, logger, 
             initialize_global_tools_sync, 
-            cleanup_global_tools,
-            get_global_tools_info,
-            tools_initialized
+            cleanup_global_tools_sync,
+            get_global_tools_info
         )
         
         # Get configuration from environment
@@ -150,13 +149,10 @@ def main():
         def cleanup_on_exit():
             """Clean up global tool pool when application shuts down."""
             logger.info("🧹 Application shutting down, cleaning up global tool pool...")
-            if tools_initialized:
+            if get_global_tools_info()['initialized']:
                 try:
-                    import asyncio
-                    cleanup_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(cleanup_loop)
-                    cleanup_loop.run_until_complete(cleanup_global_tools())
-                    cleanup_loop.close()
+                    # Runs cleanup on the tool manager's own loop, where the MCP connections live
+                    cleanup_global_tools_sync()
                 except Exception as e:
                     logger.error(f"Error occurred while cleaning up tool pool: {e}")
         
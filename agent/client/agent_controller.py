@@ -11,10 +11,8 @@ import uuid
 import datetime
 import shutil
 import threading
-from contextlib import AsyncExitStack
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-import queue
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 import logging
 import zipfile
 import tempfile
@@ -22,11 +20,35 @@ import time
 import base64
 import io
 import concurrent.futures
+import collections
+import itertools
+import atexit
+import functools
+import gzip
+import hashlib
+import queue
+import sys
+import sqlite3
+import array
+import math
 
 # Flask-related imports
 from flask import Flask, request, jsonify, Response, send_file
 from flask_cors import CORS
 
+# Optional fast JSON encoder - falls back to the stdlib json module when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
 # Original imports remain unchanged
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters
@@ -121,6 +143,45 @@ META_SYSTEM_PROMPT = """You are the META-PLANNER in a hierarchical AI system. A
 -   This system must be fully autonomous - never create tasks requiring human input or intervention.
 -   The `FINAL ANSWER` should reference the created summary website HTML file for complete details.
 """
+
+# Condensed META prompt: the rules of META_SYSTEM_PROMPT as terse bullets plus one example plan,
+# roughly half the tokens per planner call. Enabled with META_PROMPT_COMPACT=1.
+META_SYSTEM_PROMPT_COMPACT = """You are the META-PLANNER of a hierarchical agent. You plan; the EXECUTOR runs tools. Fully autonomous: never plan tasks needing human input.
+
+RULES
+- Output a complete TODO.md; after each EXECUTOR result, re-output it with done tasks `[x]`, pending `[ ]`.
+- Never run tools yourself.
+- On failure / `EXECUTION_BLOCKED`: new TODO.md, keep every `[x]`, revise or replace the failed/pending tasks (see Alternative Approaches).
+- 1-3 main tasks by default, 4+ only if truly needed, max 8 incl. the final task; broad achievable tasks, no micro-steps.
+- Only tasks feasible with available tools; always one executable path; prefer partial/simplified results over stalling.
+- Write TODO.md in the user's language (markdown syntax unchanged).
+- Sections: `# Task Plan for: <goal>`, `## Main Tasks`, `## Alternative Approaches` (2-3 different methods), `## Progress Summary`; optional `## Current Status Analysis`, `## Strategy Adjustment`.
+
+FINAL TASK (mandatory, always last)
+- "Create a comprehensive summary website named `Result.html` using the write_workspace_file tool, in the EXECUTOR's 'Modern Blog Style' CSS and JS."
+- Include a single-column outline: `<h1>` title; ToC links in `<nav id='table-of-contents'>`; one `<section id=...>` per topic using `<h2>`, `<p>`, `<ul>`, `<pre>`, `<blockquote>` as needed.
+- `FINAL ANSWER` only after the EXECUTOR confirms `Result.html` was created; `[x]` without confirmation -> re-output TODO.md asking for it.
+
+OUTPUT (nothing else: no JSON, no explanations)
+- Planning/replanning: the full TODO.md only.
+- All done and confirmed: `FINAL ANSWER: <answer>` referencing `Result.html`.
+
+EXAMPLE TODO.md
+# Task Plan for: Compare Python web frameworks
+
+## Main Tasks
+- [x] Collect benchmarks and docs for Flask, FastAPI and Django
+- [ ] Compare performance, ecosystem and learning curve in a table
+- [ ] Create a comprehensive summary website named `Result.html` using the write_workspace_file tool in 'Modern Blog Style': `<h1>` "Python Web Frameworks Compared"; ToC: Summary, Methodology, Findings; `<section id='findings'>` with the comparison table and a `<blockquote>` recommendation
+
+## Alternative Approaches
+- Use official docs and GitHub statistics if benchmark sites are unreachable
+- Compare two frameworks only, as a partial answer
+
+## Progress Summary
+Benchmarks collected; comparison pending.
+"""
+
 EXEC_SYSTEM_PROMPT = (
     "You are the EXECUTOR, a highly autonomous sub-agent. You will receive a TODO.md file from the meta-planner. Your primary goal is to accomplish the tasks assigned to you with persistence and resourcefulness.\n\n"
     "**CORE DIRECTIVE: AUTONOMOUS PROBLEM SOLVING**\n"
@@ -212,32 +273,133 @@ EXEC_SYSTEM_PROMPT = (
     "- Never output `FINAL ANSWER`.\n"
     "- Be persistent. Your default behavior should be to retry and find solutions, not to report failures."
 )
+
+# Shared system messages, never mutated. Every request starts with the same bytes so provider-side
+# prompt caching can reuse them; per-task context goes in a trailing user message instead.
+META_PROMPT_COMPACT = os.getenv("META_PROMPT_COMPACT", "0") == "1"
+META_SYS_MSG = {"role": "system", "content": META_SYSTEM_PROMPT_COMPACT if META_PROMPT_COMPACT else META_SYSTEM_PROMPT}
+EXEC_SYS_MSG = {"role": "system", "content": EXEC_SYSTEM_PROMPT}
+# Bordered console copy of every log_block entry (the logger output is always written)
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "0") == "1"
+# Emoji markers on tool manager log lines; off by default so those records stay pure ASCII
+LOG_EMOJI = os.getenv("LOG_EMOJI", "0") == "1"
+
+def _icon(symbol: str) -> str:
+    return f"{symbol} " if LOG_EMOJI else ""
+
+class AsyncLogWriter:
+    """Formats and writes log_block entries on a daemon thread so callers never block on I/O.
+
+    Entries are drained in batches; the console copy of a batch goes out in a single
+    write. When the queue is full new entries are dropped and counted.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-block-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, title: str, content: Any):
+        try:
+            self._queue.put_nowait((title, content))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Block until every queued entry has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            console = []
+            for title, content in batch:
+                try:
+                    if not isinstance(content, str):
+                        try:
+                            if orjson is not None:
+                                content = orjson.dumps(content, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+                            else:
+                                content = json.dumps(content, indent=2, ensure_ascii=False)
+                        except Exception:
+                            content = repr(content)
+                    # Logger output for structured logging
+                    logger.info(f"[{title}] {content}")
+                    if LOG_CONSOLE:
+                        border = "=" * max(len(title), 50)
+                        console.append(f"\n{border}\n{title}\n{border}\n{content}\n\n")
+                except Exception:
+                    pass
+            if console:
+                try:
+                    sys.stdout.write("".join(console))
+                    sys.stdout.flush()
+                except Exception:
+                    pass
+            for _ in batch:
+                self._queue.task_done()
+
+_log_writer = AsyncLogWriter()
+atexit.register(_log_writer.flush)
+
 # English: 原有工具function - 保持不变
 def log_block(title: str, content: str):
-    """Enhanced logging function with both console and logger output"""
-    if not isinstance(content, str):
-        try:
-            content = json.dumps(content, indent=2, ensure_ascii=False)
-        except Exception:
-            content = repr(content)
+    """Queue a titled log entry; formatting and output happen on the log writer thread"""
+    _log_writer.put(title, content)
 
-    border = "=" * max(len(title), 50)
-    formatted_log = f"\n{border}\n{title}\n{border}\n{content}\n"
-    
-    # Console output
-    print(formatted_log)
-    
-    # Logger output for structured logging
-    logger.info(f"[{title}] {content}")
+_FENCE_HEAD_RE = re.compile(r"^```[^\n]*\n")
+_FENCE_TAIL_RE = re.compile(r"\n?```$")
+# A TODO.md checklist line: "- [ ] task" / "- [x] task"
+_TODO_ITEM_RE = re.compile(r"\s*[-*] \[[ xX]?\]")
+# Minimum seconds between partial TODO.md pushes while the plan is streaming
+PLAN_STREAM_PUSH_INTERVAL = 0.5
 
+@functools.lru_cache(maxsize=1024)
 def _strip_fences(text: str) -> str:
     text = text.strip()
     if text.startswith("```"):
-        text = re.sub(r"^```[^\n]*\n", "", text)
-        text = re.sub(r"\n?```$", "", text)
+        text = _FENCE_HEAD_RE.sub("", text)
+        text = _FENCE_TAIL_RE.sub("", text)
         return text.strip()
-    m = re.search(r"{[\\s\\S]*}", text)
-    return m.group(0) if m else text
+    obj = _extract_json_object(text)
+    return obj if obj is not None else text
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """Return the first balanced {...} in text, skipping braces inside JSON strings.
+
+    Single forward pass; if the object is never closed, falls back to the span
+    from the first '{' to the last '}'.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    end = text.rfind("}")
+    return text[start:end + 1] if end > start else None
 
 def _serialize_for_json(obj: Any) -> Any:
     """Convert complex objects to JSON-serializable format."""
@@ -254,14 +416,56 @@ def _serialize_for_json(obj: Any) -> Any:
     else:
         return str(obj)
 
+def _json_default(obj: Any) -> Any:
+    """orjson/json fallback for the same object kinds _serialize_for_json handles."""
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    if hasattr(obj, 'content') and hasattr(obj, 'type'):
+        return str(obj.content)
+    return str(obj)
+
+def _serialize_to_json_bytes(obj: Any, indent: bool = False) -> bytes:
+    """Serialize obj straight to UTF-8 JSON bytes without building an intermediate Python tree."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_json_default, option=option)
+    return json.dumps(obj, default=_json_default, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
 def create_task_cache_dir(base_cache_dir: str) -> str:
     """Create a unique cache directory for a new task."""
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    task_id = str(uuid.uuid4())[:8]
-    task_dir_name = f"task_{timestamp}_{task_id}"
-    task_cache_dir = Path(base_cache_dir) / task_dir_name
-    task_cache_dir.mkdir(parents=True, exist_ok=True)
-    return str(task_cache_dir)
+    # Nanosecond timestamp plus 32 random bits: sortable by creation time and unique under bursts
+    task_cache_dir = os.path.join(base_cache_dir, f"task_{time.time_ns()}_{os.urandom(4).hex()}")
+    os.makedirs(task_cache_dir, exist_ok=True)
+    return task_cache_dir
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+_WRITE_CHUNK_CHARS = 1 << 16
+
+def _write_all(fd: int, content: bytes):
+    data = memoryview(content)
+    while data:
+        data = data[os.write(fd, data):]
+
+def write_text_file(path, content: str):
+    """Encode and write 64K-character slices with raw os calls, bypassing TextIOWrapper (no fsync).
+
+    Large contents never hold a second full-size UTF-8 copy in memory.
+    """
+    fd = os.open(path, _WRITE_FLAGS, 0o644)
+    try:
+        for start in range(0, len(content), _WRITE_CHUNK_CHARS):
+            _write_all(fd, content[start:start + _WRITE_CHUNK_CHARS].encode("utf-8", "replace"))
+    finally:
+        os.close(fd)
+
+def write_bytes_file(path, content: bytes):
+    """Write bytes with raw os calls (no fsync)."""
+    fd = os.open(path, _WRITE_FLAGS, 0o644)
+    try:
+        _write_all(fd, content)
+    finally:
+        os.close(fd)
 
 # English: 原有backendclass - 保持不变
 from abc import ABC, abstractmethod
@@ -276,13 +480,17 @@ class ChatBackend(ABC):
         tools: List[Dict[str, Any]] | None = None,
         tool_choice: str | None = "auto",
         max_tokens: int = 10000,
+        tier: str = "planner",
     ) -> Dict[str, Any]:
         ...
 
 class OpenAIBackend(ChatBackend):
-    def __init__(self, model: str, api_key: str, base_url: str = None, reasoning_effort = None, error_callback = None):
+    def __init__(self, model: str, api_key: str, base_url: str = None, reasoning_effort = None, error_callback = None, client: AsyncOpenAI = None, models: Dict[str, str] = None):
         self.model = model
-        self.client = AsyncOpenAI(
+        # Model per tier; chat(tier=...) picks one, unknown tiers fall back to the main model
+        self.models = {"planner": model, **(models or {})}
+        # Backends used on the same event loop can share one client (and its keep-alive connection pool)
+        self.client = client or AsyncOpenAI(
             api_key=api_key,
             base_url=base_url,
         )
@@ -295,10 +503,11 @@ class OpenAIBackend(ChatBackend):
         tools: List[Dict[str, Any]] | None = None,
         tool_choice: str | None = "auto",
         max_tokens: int = 10000,
+        tier: str = "planner",
     ) -> Dict[str, Any]:
         # Log the request
         payload: Dict[str, Any] = {
-            "model": self.model,
+            "model": self.models.get(tier, self.model),
             "messages": messages,
             "max_tokens": max_tokens,
             "reasoning_effort":self.reasoning_effort,
@@ -312,7 +521,6 @@ class OpenAIBackend(ChatBackend):
         try:
             response = await self.client.chat.completions.create(**payload)
             msg = response.choices[0].message
-            time.sleep(2)
             raw_calls = getattr(msg, "tool_calls", None)
             tool_calls: List[Dict[str, Any]] | None = None
             if raw_calls:
@@ -334,19 +542,138 @@ class OpenAIBackend(ChatBackend):
             return result
             
         except Exception as e:
-            error_msg = f"LLM API call failed: {str(e)}"
-            log_block("LLM ERROR", error_msg)
-            logger.error(f"LLM request failed: {e}")
-            
-            # Send error to frontend
-            if self.error_callback:
-                try:
-                    self.error_callback(f"🚨 {error_msg}", "error")
-                except Exception as callback_error:
-                    logger.error(f"Error callback failed: {callback_error}")
-            
+            self._report_error(e)
             raise
 
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 10000,
+        tier: str = "planner",
+    ) -> AsyncIterator[str]:
+        """Stream the text of a tool-free completion, yielding content deltas as they arrive."""
+        payload: Dict[str, Any] = {
+            "model": self.models.get(tier, self.model),
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "reasoning_effort": self.reasoning_effort,
+            "stream": True,
+        }
+        try:
+            stream = await self.client.chat.completions.create(**payload)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            self._report_error(e)
+            raise
+
+    def _report_error(self, e: Exception):
+        error_msg = f"LLM API call failed: {str(e)}"
+        log_block("LLM ERROR", error_msg)
+        logger.error(f"LLM request failed: {e}")
+        
+        # Send error to frontend
+        if self.error_callback:
+            try:
+                self.error_callback(f"🚨 {error_msg}", "error")
+            except Exception as callback_error:
+                logger.error(f"Error callback failed: {callback_error}")
+
+    async def embed(self, text: str, model: str) -> List[float]:
+        """Embed text with the same endpoint/credentials as chat."""
+        response = await self.client.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
+
+# ==============================================================================
+# Plan cache - reuse TODO.md plans for similar goals (opt-in via PLAN_CACHE_ENABLED=1)
+# ==============================================================================
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "0") == "1"
+PLAN_CACHE_DB = os.path.join("workspaces", "plan_cache.sqlite")
+PLAN_CACHE_THRESHOLD = float(os.getenv("PLAN_CACHE_THRESHOLD", "0.90"))
+PLAN_CACHE_EMBED_MODEL = os.getenv("PLAN_CACHE_EMBED_MODEL", "text-embedding-3-small")
+PLAN_CACHE_ADAPT_MODEL = os.getenv("PLAN_CACHE_ADAPT_MODEL", "gpt-4o-mini")
+
+PLAN_ADAPT_PROMPT = (
+    "You adapt a cached TODO.md plan to a new user goal. Keep the exact TODO.md format of the template "
+    "(sections, checkbox syntax, task numbering) and change only what the new goal requires. "
+    "Replace every placeholder such as <path> or <url> with concrete values or remove it. "
+    "Output only the adapted TODO.md."
+)
+
+# Task-specific details removed from a plan before it is stored as a template
+_PLAN_URL_RE = re.compile(r"https?://\S+")
+_PLAN_PATH_RE = re.compile(r"(?:[A-Za-z]:)?(?:[\\/][\w.-]+){2,}[\\/]?")
+
+def make_plan_template(plan: str) -> str:
+    """Strip URLs and filesystem paths from a planner output so it can be reused for other goals."""
+    return _PLAN_PATH_RE.sub("<path>", _PLAN_URL_RE.sub("<url>", plan))
+
+class PlanCache:
+    """TODO.md templates keyed by a normalized embedding of the user goal.
+
+    Rows live in SQLite; the vectors are also held in memory so lookups are a
+    linear cosine scan (dot product of unit vectors) without touching disk.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._entries: List[tuple] = []
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans(goal_hash TEXT PRIMARY KEY, embedding BLOB, todo_template TEXT)"
+            )
+            for blob, template in self._conn.execute("SELECT embedding, todo_template FROM plans"):
+                vector = array.array('f')
+                vector.frombytes(blob)
+                self._entries.append((vector, template))
+        logger.info(f"Plan cache loaded {len(self._entries)} templates from {db_path}")
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> array.array:
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        return array.array('f', (x / norm for x in embedding))
+
+    def lookup(self, embedding: List[float], threshold: float = PLAN_CACHE_THRESHOLD) -> Optional[str]:
+        """Return the template of the most similar cached goal, if it clears the threshold."""
+        query = self._normalize(embedding)
+        best_score, best_template = threshold, None
+        with self._lock:
+            entries = list(self._entries)
+        for vector, template in entries:
+            if len(vector) != len(query):
+                continue
+            score = math.fsum(map(float.__mul__, query, vector))
+            if score >= best_score:
+                best_score, best_template = score, template
+        return best_template
+
+    def add(self, goal: str, embedding: List[float], plan: str):
+        vector = self._normalize(embedding)
+        template = make_plan_template(plan)
+        goal_hash = hashlib.sha1(goal.strip().lower().encode("utf-8")).hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?)", (goal_hash, vector.tobytes(), template)
+            )
+            self._entries.append((vector, template))
+
+plan_cache: Optional[PlanCache] = None
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """Open the shared plan cache on first use; None when PLAN_CACHE_ENABLED is off or it cannot be opened."""
+    global plan_cache
+    if PLAN_CACHE_ENABLED and plan_cache is None:
+        try:
+            plan_cache = PlanCache(PLAN_CACHE_DB)
+        except Exception as e:
+            logger.error(f"Plan cache unavailable: {e}")
+    return plan_cache
+
 # ==============================================================================
 # Flask integration layer - new section, wrapping original code
 # ==============================================================================
@@ -362,59 +689,227 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+TASK_QUEUE_MAXSIZE = 2048
+
+class TaskMessageQueue:
+    """Per-task message queue: a deque for the payload plus a Condition to wake the consumer.
+
+    deque.append/popleft are atomic in CPython, so the deque itself needs no lock;
+    the Condition is only held to notify and to block the streaming consumer, which
+    waits on a non-empty predicate so it never wakes to an empty queue. The deque is bounded:
+    when a slow consumer falls behind the oldest message is dropped, and every
+    message carries a monotonic 'seq' so clients can detect the gap.
+
+    Messages are serialized once on put and queued as ready-to-send JSON lines, paired
+    with a flag marking the final task_update, so the stream only writes bytes.
+
+    Producer and consumer are one each (the task's client / the streaming endpoint),
+    so put only takes the Condition when the consumer is actually parked in drain;
+    a burst of emits while the stream is busy writing is lock-free.
+    """
+
+    def __init__(self, maxsize: int = TASK_QUEUE_MAXSIZE):
+        self._messages = collections.deque(maxlen=maxsize)
+        self._ready = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = False
+        self.dropped = 0
+
+    def put(self, message: dict) -> bytes:
+        """Queue message and return its serialized JSON line for the caller to reuse."""
+        message['seq'] = next(self._seq)
+        finished = (message.get('type') == 'task_update' and
+                    (message.get('data') or {}).get('status') in ('completed', 'failed'))
+        line = _serialize_to_json_bytes(message) + b'\n'
+        if len(self._messages) == self._messages.maxlen:
+            self.dropped += 1
+        self._messages.append((line, finished))
+        # drain sets _waiting before re-checking the deque, so either it sees this
+        # message or we see the flag and wake it
+        if self._waiting:
+            with self._ready:
+                self._ready.notify()
+        return line
+
+    def drain(self, timeout: float = None) -> List[tuple]:
+        """Wait up to timeout for messages and return every queued (line, finished) pair."""
+        if not self._messages:
+            with self._ready:
+                self._waiting = True
+                try:
+                    self._ready.wait_for(lambda: self._messages, timeout=timeout)
+                finally:
+                    self._waiting = False
+        drained = []
+        while self._messages:
+            drained.append(self._messages.popleft())
+        return drained
+
+COMPLETED_TASKS_DB = os.path.join("workspaces", "completed_tasks.sqlite")
+
+class CompletedTaskStore:
+    """Completed-task records kept in SQLite instead of a process-lifetime dict.
+
+    Supports the dict operations the routes use (in, [], []=, get, len, items).
+    Full records are stored as JSON and only decoded by [] / get; items() yields
+    the summary columns used by the task listing, newest first. The database is
+    opened on first use (the path is made absolute then, not at import), and
+    workspaces stay the source of truth: load_existing_tasks_from_workspaces
+    calls retain() to drop rows whose workspace is gone.
+    """
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        # Callers hold self._lock
+        if self._conn is None:
+            db_path = os.path.abspath(self._db_path)
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks("
+                "task_id TEXT PRIMARY KEY, prompt TEXT, status TEXT, completed_at REAL, "
+                "workspace_dir TEXT, final_answer TEXT, data TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_completed_at ON tasks(completed_at)")
+            self._conn = conn
+        return self._conn
+
+    def retain(self, task_ids) -> int:
+        """Delete records whose task_id is not in task_ids; returns how many were removed."""
+        keep = set(task_ids)
+        with self._lock:
+            db = self._db()
+            stale = [(task_id,) for (task_id,) in db.execute("SELECT task_id FROM tasks") if task_id not in keep]
+            if stale:
+                db.executemany("DELETE FROM tasks WHERE task_id = ?", stale)
+        return len(stale)
+
+    def __setitem__(self, task_id: str, record: Dict[str, Any]):
+        row = (
+            task_id,
+            record.get('prompt', ''),
+            record.get('final_status', 'completed'),
+            record.get('completed_at'),
+            record.get('workspace_dir', ''),
+            record.get('final_result'),
+            json.dumps(record, ensure_ascii=False, default=str),
+        )
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+
+    def get(self, task_id: str, default=None):
+        with self._lock:
+            row = self._db().execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        record = self.get(task_id)
+        if record is None:
+            raise KeyError(task_id)
+        return record
+
+    def __contains__(self, task_id: str) -> bool:
+        with self._lock:
+            return self._db().execute("SELECT 1 FROM tasks WHERE task_id = ?", (task_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def items(self, limit: int = -1):
+        """(task_id, summary) pairs, newest first; summary has prompt/final_status/completed_at/workspace_dir."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT task_id, prompt, status, completed_at, workspace_dir FROM tasks "
+                "ORDER BY completed_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            (task_id, {'prompt': prompt, 'final_status': status, 'completed_at': completed_at, 'workspace_dir': workspace_dir})
+            for task_id, prompt, status, completed_at, workspace_dir in rows
+        ]
+
 # Global state management
 active_tasks: Dict[str, Dict[str, Any]] = {}
-task_queues: Dict[str, queue.Queue] = {}
+task_queues: Dict[str, TaskMessageQueue] = {}
 task_clients: Dict[str, 'HierarchicalClient'] = {}
-completed_tasks_history: Dict[str, Dict[str, Any]] = {}
+completed_tasks_history = CompletedTaskStore(COMPLETED_TASKS_DB)
+# Guards mutations of the task registries above; Flask serves requests on multiple threads
+tasks_lock = threading.RLock()
+# Bumped on every change to active_tasks/completed_tasks_history; keys the cached /api/tasks payload
+tasks_version = 0
+
+def mark_tasks_changed():
+    """Record that the task registries changed so cached task listings are rebuilt."""
+    global tasks_version
+    with tasks_lock:
+        tasks_version += 1
+
+def _new_event_loop() -> asyncio.AbstractEventLoop:
+    """A new event loop, uvloop-backed when uvloop is installed."""
+    try:
+        import uvloop
+        return uvloop.new_event_loop()
+    except ImportError:
+        return asyncio.new_event_loop()
+
+def _start_shared_loop() -> asyncio.AbstractEventLoop:
+    """Start the persistent event loop that sync Flask handlers submit coroutines to."""
+    loop = _new_event_loop()
+    threading.Thread(target=loop.run_forever, name="shared-request-loop", daemon=True).start()
+    return loop
 
-# Global tool service pool - new addition
-global_tool_sessions: Dict[str, ClientSession] = {}
-global_tools_schema: List[Dict[str, Any]] = []
-global_exit_stack: Optional[AsyncExitStack] = None
-tools_initialized: bool = False
+# Shared by request handlers instead of creating an event loop per request
+shared_loop = _start_shared_loop()
 
 # File type definitions
-URL_FILE_TYPES = {
+URL_FILE_TYPES = frozenset({
     '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg', '.ico',
     '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv',
     '.pdf', '.mp3', '.wav', '.aac', '.ogg', '.m4a',
     '.zip', '.rar', '.7z', '.tar', '.gz',
     '.exe', '.msi', '.dmg', '.deb', '.rpm'
-}
+})
 
-EDITABLE_FILE_TYPES = {
+EDITABLE_FILE_TYPES = frozenset({
     '.md', '.txt', '.py', '.js', '.ts', '.tsx', '.jsx', '.css', '.scss', '.less',
     '.json', '.xml', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.conf',
     '.sh', '.bat', '.ps1', '.sql', '.csv', '.log'
+})
+
+# Extension -> frontend rendering type; anything not listed renders as 'text'
+FILE_TYPE_BY_EXT = {
+    **dict.fromkeys(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg', '.ico'), 'image'),
+    **dict.fromkeys(('.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'), 'video'),
+    **dict.fromkeys(('.mp3', '.wav', '.aac', '.ogg', '.m4a'), 'audio'),
+    '.pdf': 'pdf',
+    '.html': 'html',
+    '.md': 'markdown',
 }
 
+def _file_ext(filename: str) -> str:
+    # os.path.splitext avoids building a Path object; like Path.suffix it ignores dots in directory names
+    return os.path.splitext(filename)[1].lower()
+
+@functools.lru_cache(maxsize=2048)
 def should_use_url_mode(filename: str) -> bool:
     """Determine if file should use URL mode for transmission"""
-    file_ext = Path(filename).suffix.lower()
-    return file_ext in URL_FILE_TYPES
+    return _file_ext(filename) in URL_FILE_TYPES
 
+@functools.lru_cache(maxsize=2048)
 def is_editable_file(filename: str) -> bool:
     """Determine if file is editable"""
-    file_ext = Path(filename).suffix.lower()
-    return file_ext in EDITABLE_FILE_TYPES
+    return _file_ext(filename) in EDITABLE_FILE_TYPES
 
+@functools.lru_cache(maxsize=2048)
 def detect_file_type(filename: str) -> str:
     """Classify file type for frontend rendering."""
-    file_ext = Path(filename).suffix.lower()
-    if file_ext in {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg', '.ico'}:
-        return 'image'
-    if file_ext in {'.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'}:
-        return 'video'
-    if file_ext == '.pdf':
-        return 'pdf'
-    if file_ext == '.html':
-        return 'html'
-    if file_ext == '.md':
-        return 'markdown'
-    if file_ext in {'.mp3', '.wav', '.aac', '.ogg', '.m4a'}:
-        return 'audio'
-    return 'text'
+    return FILE_TYPE_BY_EXT.get(_file_ext(filename), 'text')
 
 # ==============================================================================
 # Global tool service management - new addition
@@ -423,119 +918,196 @@ def detect_file_type(filename: str) -> str:
 import threading
 import concurrent.futures
 
+# Terminal tools in order of preference for /api/terminal
+TERMINAL_TOOL_PRIORITY = ('execute_terminal_command', 'terminal_command', 'shell_command')
+# Server script types the tool manager knows how to launch
+SERVER_SCRIPT_SUFFIXES = frozenset((".py", ".js"))
+# Seconds a single MCP tool call may take before it is abandoned
+TOOL_CALL_TIMEOUT = 300
+# Read-only tools whose results are reused for identical arguments. Any call to a tool outside
+# this set may change the workspace, so it drops every cached result.
+CACHEABLE_TOOLS = frozenset((
+    "list_workspace_files", "read_workspace_file", "get_workspace_info", "get_workspace_structure",
+    "add", "sub", "multiply", "divide", "round",
+))
+# Results also expire; UI saves and workspace scans that find changes clear the cache outright
+TOOL_RESULT_CACHE_TTL = 5.0
+TOOL_RESULT_CACHE_SIZE = 256
+# Default executor threads for the tool loop; same heuristic as ThreadPoolExecutor's own default
+TOOL_MANAGER_THREADS = int(os.getenv("TOOL_MANAGER_THREADS", min(32, (os.cpu_count() or 1) + 4)))
+
+class ServerConn:
+    """One connected MCP server script: its session and the tools it listed at connect time."""
+    
+    __slots__ = ("script", "priority", "session", "tools")
+    
+    def __init__(self, script: str, priority: int, session: ClientSession, tools: list):
+        self.script = script
+        # Position of the script in get_available_servers(); lower wins on duplicate tool names
+        self.priority = priority
+        self.session = session
+        self.tools = tools
+
 class ToolManager:
     """Tool manager - handles asynchronous tool calls"""
     
     def __init__(self):
         self.sessions = {}
-        self.tools_schema = []
-        self.exit_stack = None
+        # One entry per connected server, in connect order; tools map to them by index
+        self.servers: List[ServerConn] = []
+        self.tool_to_server: Dict[str, int] = {}
+        self.tools_schema = ()
+        self.tool_names: List[str] = []
+        # Entered stdio_client / ClientSession contexts, closed in reverse order by _close_contexts
+        self._contexts: List[Any] = []
         self.initialized = False
         self.loop = None
         self.executor = None
         self._lock = threading.Lock()
+        # Bumped whenever the tool set changes so cached tool info can be invalidated
+        self.tools_version = 0
+        # get_tools_info() result, rebuilt only after the tool set changes
+        self._tools_info: Optional[Dict[str, Any]] = None
+        # Terminal tool picked from TERMINAL_TOOL_PRIORITY once the tools are loaded
+        self.resolved_terminal_tool: Optional[str] = None
+        # Clients currently attached to the shared sessions; they hold references, never their own sessions
+        self.client_refs = 0
+        # (tool name, canonical args) -> (expiry, result) for CACHEABLE_TOOLS
+        self._result_cache: "collections.OrderedDict[tuple, tuple]" = collections.OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        # Bumped on every invalidation; a read that overlapped a write is not cached
+        self._cache_generation = 0
+        # In-flight _async_init, shared by every initialize_sync() caller until it settles
+        self._init_future: Optional[concurrent.futures.Future] = None
+        # Tool name -> session.call_tool bound to that name, rebuilt whenever the tool set changes
+        self.tool_dispatch: Dict[str, Callable[..., Awaitable]] = {}
     
-    def initialize_sync(self):
-        """Initialize tool pool synchronously"""
+    def _resolve_terminal_tool(self) -> Optional[str]:
+        for tool_name in TERMINAL_TOOL_PRIORITY:
+            if tool_name in self.sessions:
+                return tool_name
+        return None
+    
+    def _begin_init(self) -> Optional[concurrent.futures.Future]:
+        """Start the tool loop and _async_init once; returns the shared in-flight init future,
+        or None when the pool is already initialized.
+
+        The lock only covers the flag check and loop startup; the bootstrap itself is waited on
+        outside it, so acquire()/release() and concurrent callers never block behind the handshakes.
+        """
         with self._lock:
             if self.initialized:
                 logger.info("Tool services already initialized, skipping duplicate initialization")
-                return True
-            
-            logger.info("🔧 Initializing global tool service pool...")
+                return None
             
-            try:
-                # Create dedicated event loop and thread pool
-                import asyncio
-                self.loop = asyncio.new_event_loop()
-                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+            if self._init_future is None:
+                logger.info("%sInitializing global tool service pool...", _icon("🔧"))
+                # Create dedicated event loop (uvloop when available: it only carries MCP stdio pipes) and thread pool
+                self.loop = _new_event_loop()
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=TOOL_MANAGER_THREADS, thread_name_prefix="tool-manager")
+                # run_in_executor(None, ...) on the tool loop uses this pool
+                self.loop.set_default_executor(self.executor)
+                # 3.12+: tasks run eagerly up to their first real suspension, skipping a scheduler pass
+                if sys.version_info >= (3, 12):
+                    self.loop.set_task_factory(asyncio.eager_task_factory)
                 
                 # Run event loop in new thread
-                def run_loop():
-                    asyncio.set_event_loop(self.loop)
-                    self.loop.run_forever()
+                def run_loop(loop=self.loop):
+                    asyncio.set_event_loop(loop)
+                    loop.run_forever()
                 
                 loop_thread = threading.Thread(target=run_loop, daemon=True)
                 loop_thread.start()
                 
                 # Asynchronously initialize tools
-                future = asyncio.run_coroutine_threadsafe(self._async_init(), self.loop)
-                success = future.result(timeout=60)  # 60 second timeout
-                
+                self._init_future = asyncio.run_coroutine_threadsafe(self._async_init(), self.loop)
+            return self._init_future
+    
+    def _finish_init(self, future: concurrent.futures.Future, success: bool) -> bool:
+        with self._lock:
+            if self._init_future is future:
+                self._init_future = None
                 if success:
                     self.initialized = True
-                    logger.info("✅ Tool manager initialized successfully")
-                    
-                return success
-                
-            except Exception as e:
-                logger.error(f"❌ Tool manager initialization failed: {e}")
-                return False
+                    self.resolved_terminal_tool = self._resolve_terminal_tool()
+                    self.tools_version += 1
+                    self._tools_info = None
+                    logger.info("%sTool manager initialized successfully", _icon("✅"))
+            return self.initialized if success else False
+    
+    def initialize_sync(self):
+        """Initialize tool pool synchronously; blocks the calling thread, so never call it from a running event loop"""
+        try:
+            future = self._begin_init()
+        except Exception as e:
+            logger.error("%sTool manager initialization failed: %s", _icon("❌"), e)
+            return False
+        if future is None:
+            return True
+        
+        try:
+            success = future.result(timeout=60)  # 60 second timeout
+        except Exception as e:
+            logger.error("%sTool manager initialization failed: %s", _icon("❌"), e)
+            success = False
+        return self._finish_init(future, success)
+    
+    async def initialize(self):
+        """Initialize tool pool from a coroutine; waits for the bootstrap without blocking the caller's loop"""
+        try:
+            future = self._begin_init()
+        except Exception as e:
+            logger.error("%sTool manager initialization failed: %s", _icon("❌"), e)
+            return False
+        if future is None:
+            return True
+        
+        try:
+            # shield: a timeout here must not cancel the init other callers are waiting on too
+            success = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=60)
+        except Exception as e:
+            logger.error("%sTool manager initialization failed: %s", _icon("❌"), e)
+            success = False
+        return self._finish_init(future, success)
     
     async def _async_init(self):
         """Asynchronously initialize tool connections"""
         try:
-            self.exit_stack = AsyncExitStack()
             existing_scripts = get_available_servers()
             
             if not existing_scripts:
                 raise RuntimeError("没有找到可用的server scripts")
             
-            connected_tools = []
             failed_connections = []
             
-            for script in existing_scripts:
+            # setup通用环境variable: one environment shared by every server process
+            workspace_root = str(Path("workspaces").absolute())
+            server_env = {**os.environ, "AGENT_CACHE_DIR": workspace_root, "AGENT_WORKSPACE": workspace_root}
+            
+            async def connect(priority: int, script: str):
                 try:
-                    path = Path(script)
-                    if path.suffix not in {".py", ".js"}:
-                        failed_connections.append((script, "无效的脚本class型"))
-                        continue
-                        
-                    if not path.exists():
-                        failed_connections.append((script, "脚本file不存在"))
-                        continue
-                    
-                    # Use python3 instead of python for better compatibility
-                    command = "python3" if path.suffix == ".py" else "node"
-                    
-                    # setup通用环境variable
-                    env = os.environ.copy()
-                    env["AGENT_CACHE_DIR"] = str(Path("workspaces").absolute())
-                    env["AGENT_WORKSPACE"] = str(Path("workspaces").absolute())
-                    
-                    params = StdioServerParameters(command=command, args=[str(path)], env=env)
-                    stdio_transport = await self.exit_stack.enter_async_context(stdio_client(params))
-                    stdio, write = stdio_transport
-                    session = await self.exit_stack.enter_async_context(ClientSession(stdio, write))
-                    await session.initialize()
-                    
-                    # get工具列表
-                    tools_resp = await session.list_tools()
-                    server_tools = []
-                    
-                    for tool in tools_resp.tools:
-                        if tool.name in self.sessions:
-                            logger.warning(f"工具名称重复 '{tool.name}' 来自 {script}")
-                            continue
-                        
-                        self.sessions[tool.name] = session
-                        server_tools.append(tool.name)
-                        connected_tools.append(tool.name)
-                    
-                    logger.info(f"✅ 服务器 {script} 连接success，工具: {server_tools}")
-                    
+                    return priority, script, await self._connect_one(script, server_env), None
                 except Exception as e:
-                    failed_connections.append((script, str(e)))
-                    logger.error(f"❌ 服务器 {script} 连接failed: {e}")
+                    return priority, script, None, e
+            
+            # English: 所有服务器的启动和握手并发进行；每个服务器连接成功后立即注册其工具，不等待最慢的那个
+            for next_done in asyncio.as_completed([connect(i, script) for i, script in enumerate(existing_scripts)]):
+                priority, script, result, error = await next_done
+                if error is not None:
+                    failed_connections.append((script, str(error)))
+                    logger.error("%sServer %s failed to connect: %s", _icon("❌"), script, error)
+                    continue
+                
+                server_tools = self._merge_tools(priority, script, *result)
+                logger.info("%sServer %s connected, tools: %s", _icon("✅"), script, server_tools)
             
-            # English: 构建工具schema
-            await self._build_tools_schema()
+            connected_tools = list(self.tool_to_server)
             
             # English: 连接总结
             if connected_tools:
-                logger.info(f"🎉 global tool poolinitializecomplete，已连接工具: {connected_tools}")
+                logger.info("%sGlobal tool pool initialized, connected tools: %s", _icon("🎉"), connected_tools)
             if failed_connections:
-                logger.warning(f"⚠️ 部分连接failed: {[f[0] for f in failed_connections]}")
+                logger.warning("%sSome servers failed to connect: %s", _icon("⚠️"), [f[0] for f in failed_connections])
             
             if not connected_tools:
                 raise RuntimeError("没有工具success连接")
@@ -543,144 +1115,405 @@ class ToolManager:
             return True
             
         except Exception as e:
-            logger.error(f"❌ 异步工具initializefailed: {e}")
-            if self.exit_stack:
-                await self.exit_stack.aclose()
+            logger.error("%sAsync tool initialization failed: %s", _icon("❌"), e)
+            await self._close_contexts()
             raise
     
-    async def _build_tools_schema(self):
-        """构建工具schema [Contains Chinese - needs translation]"""
-        self.tools_schema = []
-        processed_sessions = set()
-        
-        # English: 按唯一session遍历，避免重复process
-        for tool_name, session in self.sessions.items():
-            session_id = id(session)
-            if session_id in processed_sessions:
-                continue
-            processed_sessions.add(session_id)
+    async def _connect_one(self, script: str, env: Dict[str, str]):
+        """Start one server script and complete its MCP handshake; returns (session, tools)."""
+        path = Path(script)
+        if path.suffix not in SERVER_SCRIPT_SUFFIXES:
+            raise RuntimeError("无效的脚本class型")
+        if not path.exists():
+            raise RuntimeError("脚本file不存在")
+        
+        # Use python3 instead of python for better compatibility
+        command = "python3" if path.suffix == ".py" else "node"
+        
+        params = StdioServerParameters(command=command, args=[str(path)], env=env)
+        stdio_cm = stdio_client(params)
+        stdio, write = await stdio_cm.__aenter__()
+        opened = [stdio_cm]
+        try:
+            session_cm = ClientSession(stdio, write)
+            session = await session_cm.__aenter__()
+            opened.append(session_cm)
+            await session.initialize()
             
+            # get工具列表
+            tools_resp = await session.list_tools()
+        except BaseException:
+            # English: 握手失败时立即关闭该服务器，不让它的子进程留到全局清理
+            await self._exit_contexts(opened)
+            raise
+        
+        # Sessions live for the whole process and are closed together in cleanup()
+        self._contexts.extend(opened)
+        return session, tools_resp.tools
+    
+    async def _exit_contexts(self, contexts: list):
+        for cm in reversed(contexts):
             try:
-                tools_resp = await session.list_tools()
-                
-                for tool in tools_resp.tools:
-                    tool_schema = {
-                        "type": "function",
-                        "function": {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "parameters": tool.inputSchema,
-                        },
-                    }
-                    self.tools_schema.append(tool_schema)
-                    
+                await cm.__aexit__(None, None, None)
             except Exception as e:
-                logger.error(f"get工具schemafailed {tool_name}: {e}")
+                logger.warning("Failed to close tool connection: %s", e)
+    
+    async def _close_contexts(self):
+        contexts, self._contexts = self._contexts, []
+        await self._exit_contexts(contexts)
+    
+    def _merge_tools(self, priority: int, script: str, session: ClientSession, tools: list) -> List[str]:
+        """Register one server's tools as soon as it connects; callable and listed right away.
+
+        Servers finish in any order, so name clashes are settled by script order: the tool
+        from the earlier script wins, as it did when servers were connected one by one.
+        """
+        server_index = len(self.servers)
+        self.servers.append(ServerConn(script, priority, session, tools))
+        server_tools = []
+        for tool in tools:
+            owner = self.tool_to_server.get(tool.name)
+            if owner is not None and self.servers[owner].priority < priority:
+                logger.warning("Duplicate tool name '%s' from %s, keeping the earlier server's tool", tool.name, script)
+                continue
+            if owner is not None:
+                logger.warning("Duplicate tool name '%s', using the one from %s", tool.name, script)
+            
+            self.tool_to_server[tool.name] = server_index
+            # name -> session view kept for the clients and the legacy global_tool_sessions
+            self.sessions[tool.name] = session
+            self.tool_dispatch[tool.name] = functools.partial(session.call_tool, tool.name)
+            server_tools.append(tool.name)
+        
+        # English: 构建工具schema
+        self._build_tools_schema()
+        self.tools_version += 1
+        self._tools_info = None
+        return server_tools
+    
+    def _build_tools_schema(self):
+        """构建工具schema from the tools listed at connect time, without another list_tools() round-trip"""
+        tool_to_server = self.tool_to_server
+        tools_schema = []
+        tool_names = []
+        for server_index, server in enumerate(self.servers):
+            for tool in server.tools:
+                # Tools that lost a duplicate-name clash belong to another server
+                if tool_to_server.get(tool.name) != server_index:
+                    continue
+                tools_schema.append({
+                    "type": "function",
+                    "function": {
+                        "name": tool.name,
+                        "description": tool.description,
+                        "parameters": tool.inputSchema,
+                    },
+                })
+                tool_names.append(tool.name)
+        # Frozen once built: every executor request passes this same object as `tools`
+        self.tools_schema = tuple(tools_schema)
+        # Schema order, collected in the same pass so get_tools_info never re-walks the schema
+        self.tool_names = tool_names
+    
+    def _resolve_call(self, tool_name: str):
+        # Tools become callable as soon as their server connects, before init as a whole completes
+        call = self.tool_dispatch.get(tool_name)
+        if call is None:
+            if not self.initialized and not self.tool_dispatch:
+                raise RuntimeError("tool manager尚未initialize")
+            raise RuntimeError(f"工具 '{tool_name}' 不存在")
+        return call
+    
+    def _on_tool_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+    
+    def _cache_key(self, tool_name: str, args: dict) -> Optional[tuple]:
+        """Key for a cacheable call; for any other tool, drop cached results since it may write."""
+        if tool_name not in CACHEABLE_TOOLS:
+            self.invalidate_cache()
+            return None
+        try:
+            return tool_name, json.dumps(args, sort_keys=True, default=str)
+        except (TypeError, ValueError):
+            return None
+    
+    def invalidate_cache(self):
+        """Drop every cached tool result; called after anything may have changed the workspace."""
+        with self._result_cache_lock:
+            self._result_cache.clear()
+            self._cache_generation += 1
+    
+    def _cache_get(self, key: Optional[tuple]):
+        if key is None:
+            return None
+        with self._result_cache_lock:
+            entry = self._result_cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._result_cache[key]
+                return None
+            self._result_cache.move_to_end(key)
+            return entry[1]
+    
+    def _cache_put(self, key: Optional[tuple], result, generation: int):
+        if key is None:
+            # A write just finished; reads cached while it ran may already be stale
+            self.invalidate_cache()
+            return
+        if getattr(result, "isError", False):
+            return
+        with self._result_cache_lock:
+            if generation != self._cache_generation:
+                return
+            self._result_cache[key] = (time.monotonic() + TOOL_RESULT_CACHE_TTL, result)
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > TOOL_RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
     
     def call_tool_sync(self, tool_name: str, args: dict):
         """synchronous method调用工具 [Contains Chinese - needs translation]"""
-        if not self.initialized:
-            raise RuntimeError("tool manager尚未initialize")
+        call = self._resolve_call(tool_name)
+        if self._on_tool_loop():
+            # Blocking on future.result() here would wait for the very loop that has to run the call
+            raise RuntimeError(f"call_tool_sync('{tool_name}') called from the tool loop; await call_tool_async instead")
         
-        if tool_name not in self.sessions:
-            raise RuntimeError(f"工具 '{tool_name}' 不存在")
+        key = self._cache_key(tool_name, args)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self._cache_generation
         
         # English: 使用asyncio.run_coroutine_threadsafe在tool manager的event loop中execute
-        future = asyncio.run_coroutine_threadsafe(
-            self._async_call_tool(tool_name, args), 
-            self.loop
-        )
+        future = asyncio.run_coroutine_threadsafe(call(args), self.loop)
         
         try:
-            return future.result(timeout=300)  # 5分钟超时
+            result = future.result(timeout=TOOL_CALL_TIMEOUT)  # 5分钟超时
         except concurrent.futures.TimeoutError:
             raise RuntimeError(f"工具 '{tool_name}' 调用超时")
+        self._cache_put(key, result, generation)
+        return result
+    
+    async def call_tool_async(self, tool_name: str, args: dict):
+        """Await a tool call from any event loop without parking a worker thread on it.
+
+        On the tool loop itself the session call is awaited directly; from another loop the
+        call is scheduled on the tool loop and its future awaited. Read-only tools in
+        CACHEABLE_TOOLS answer repeated identical calls from a short-lived cache.
+        """
+        call = self._resolve_call(tool_name)
+        key = self._cache_key(tool_name, args)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self._cache_generation
+        
+        if self._on_tool_loop():
+            awaitable = call(args)
+        else:
+            awaitable = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(call(args), self.loop))
+        
+        try:
+            result = await asyncio.wait_for(awaitable, TOOL_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"工具 '{tool_name}' 调用超时")
+        self._cache_put(key, result, generation)
+        return result
+    
+    def scale_executors(self, max_workers: int):
+        """Swap in a default executor of a different size without restarting the tool loop."""
+        if self.loop is None:
+            raise RuntimeError("tool manager尚未initialize")
+        old_executor = self.executor
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-manager")
+        self.loop.call_soon_threadsafe(self.loop.set_default_executor, self.executor)
+        if old_executor is not None:
+            # Work already submitted to the old pool finishes; it just takes no new jobs
+            old_executor.shutdown(wait=False)
     
-    async def _async_call_tool(self, tool_name: str, args: dict):
-        """异步调用工具 [Contains Chinese - needs translation]"""
-        session = self.sessions[tool_name]
-        return await session.call_tool(tool_name, args)
+    def acquire(self) -> Dict[str, ClientSession]:
+        """Attach one client to the shared session pool and return the sessions by tool name."""
+        with self._lock:
+            self.client_refs += 1
+        return self.sessions
+
+    def release(self):
+        """Detach a client; the pool itself lives for the whole process."""
+        with self._lock:
+            self.client_refs = max(0, self.client_refs - 1)
     
     def get_tools_info(self):
-        """get工具info [Contains Chinese - needs translation]"""
-        if not self.initialized:
-            return {
-                "initialized": False,
-                "tools_count": 0,
-                "tool_names": [],
-                "schema": []
-            }
+        """get工具info, built once per tool set; callers must treat the result as read-only"""
+        info = self._tools_info
+        if info is not None:
+            return info
         
-        tool_names = [tool['function']['name'] for tool in self.tools_schema]
-        return {
-            "initialized": True,
-            "tools_count": len(tool_names),
-            "tool_names": tool_names,
+        # While servers are still connecting this lists the tools registered so far
+        info = {
+            "initialized": self.initialized,
+            "tools_count": len(self.tool_names),
+            "tool_names": self.tool_names,
             "schema": self.tools_schema
         }
+        self._tools_info = info
+        return info
     
     async def cleanup(self):
         """清理tool manager [Contains Chinese - needs translation]"""
-        if self.initialized and self.exit_stack:
-            logger.info("🧹 正在清理tool manager...")
-            await self.exit_stack.aclose()
+        if self.initialized:
+            logger.info("%sCleaning up tool manager...", _icon("🧹"))
+            await self._close_contexts()
             self.sessions.clear()
-            self.tools_schema.clear()
+            self.servers = []
+            self.tool_to_server.clear()
+            self.tool_dispatch = {}
+            self.tools_schema = ()
+            self.tool_names = []
             self.initialized = False
-            if self.loop and self.loop.is_running():
-                self.loop.call_soon_threadsafe(self.loop.stop)
-            logger.info("✅ tool manager清理complete")
+            self.resolved_terminal_tool = None
+            self.tools_version += 1
+            self._tools_info = None
+            self.invalidate_cache()
+            logger.info("%sTool manager cleanup complete", _icon("✅"))
+    
+    # The server contexts were entered on the tool loop and must be exited there, so shutdown
+    # always runs cleanup() on that loop and only stops it once cleanup has finished.
+    async def shutdown(self):
+        """Clean up on the tool loop from any event loop, then stop the loop and its executor."""
+        if self.loop is None:
+            return
+        if self._on_tool_loop():
+            await self.cleanup()
+        else:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.cleanup(), self.loop))
+        self._stop_loop()
+    
+    def shutdown_sync(self, timeout: float = 30):
+        """Blocking shutdown() for plain threads such as atexit handlers."""
+        if self.loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.cleanup(), self.loop).result(timeout=timeout)
+        except Exception as e:
+            logger.error("%sTool manager cleanup failed: %s", _icon("❌"), e)
+        self._stop_loop()
+    
+    def _stop_loop(self):
+        loop, executor = self.loop, self.executor
+        self.loop = self.executor = None
+        if loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+        if executor is not None:
+            executor.shutdown(wait=False)
 
 # create全局tool manager实例
 global_tool_manager = ToolManager()
 
-# English: 为了向后兼容，保持原有的全局variable
-global_tool_sessions: Dict[str, ClientSession] = {}
-global_tools_schema: List[Dict[str, Any]] = []
-global_exit_stack: Optional[AsyncExitStack] = None
-tools_initialized: bool = False
+# English: 为了向后兼容，原有的全局variable改为直接读取tool manager的状态 (PEP 562)，不再复制
+_TOOL_MANAGER_ALIASES = {
+    'global_tool_sessions': 'sessions',
+    'global_tools_schema': 'tools_schema',
+    'tools_initialized': 'initialized',
+}
+
+def __getattr__(name: str):
+    if name in _TOOL_MANAGER_ALIASES:
+        return getattr(global_tool_manager, _TOOL_MANAGER_ALIASES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def initialize_global_tools_sync():
     """synchronous methodinitialize全局工具服务池 [Contains Chinese - needs translation]"""
-    global tools_initialized
-    
-    success = global_tool_manager.initialize_sync()
-    if success:
-        # update全局variable以保持兼容性
-        global_tool_sessions.clear()
-        global_tool_sessions.update(global_tool_manager.sessions)
-        global_tools_schema.clear()
-        global_tools_schema.extend(global_tool_manager.tools_schema)
-        tools_initialized = True
-    
-    return success
+    return global_tool_manager.initialize_sync()
 
 # English: 保持异步版本用于向后兼容
 async def initialize_global_tools():
     """异步版本的initializefunction [Contains Chinese - needs translation]"""
-    return initialize_global_tools_sync()
+    return await global_tool_manager.initialize()
 
 async def build_global_tools_schema():
     """构建全局工具schema - 已由tool managerprocess [Contains Chinese - needs translation]"""
     pass
 
 def get_global_tools_info():
-    """get全局工具info [Contains Chinese - needs translation]"""
+    """get全局工具info, cached by the tool manager until its tool set changes"""
     return global_tool_manager.get_tools_info()
 
 async def cleanup_global_tools():
     """清理全局工具服务 [Contains Chinese - needs translation]"""
-    global tools_initialized
-    await global_tool_manager.cleanup()
-    global_tool_sessions.clear()
-    global_tools_schema.clear()
-    tools_initialized = False
+    await global_tool_manager.shutdown()
+
+_planner_tools_context = (None, "")
+
+def get_planner_tools_context() -> str:
+    """META-PLANNER note listing the EXECUTOR's tools, rebuilt only when tools_version changes."""
+    global _planner_tools_context
+    version = global_tool_manager.tools_version
+    cached_version, text = _planner_tools_context
+    if cached_version == version:
+        return text
+    tool_names = global_tool_manager.get_tools_info()['tool_names']
+    text = ""
+    if tool_names:
+        text = f"The EXECUTOR has the following tools available: {tool_names}. "
+        text += "During the planning process, please simultaneously consider the potential uses of these tools and provide corresponding guidance. "
+        text += "However, please note that tools other than these are not provided/available. Therefore, instructing the EXECUTOR to use additional tools is not permitted."
+    _planner_tools_context = (version, text)
+    return text
+
+def cleanup_global_tools_sync():
+    """synchronous method清理全局工具服务, for shutdown hooks outside any event loop"""
+    global_tool_manager.shutdown_sync()
 
 # ==============================================================================
 # English: 增强的HierarchicalClient - 支持Flask集成和事件发送
 # ==============================================================================
 
 MAX_TURNS_MEMORY = 50
+# Message types that force buffered messages.jsonl lines to disk right away
+MESSAGE_FLUSH_TYPES = frozenset(("task_update", "final_answer", "error"))
+# Upper bound on tool calls from one executor reply that run at the same time
+TOOL_CALL_CONCURRENCY = 8
+# file_update events sent per shared-loop iteration, and the cap on distinct files waiting to be sent
+BROADCAST_BATCH_SIZE = 50
+MAX_PENDING_FILE_UPDATES = 1024
+# With a workspace watcher, still rescan everything this often (seconds) to catch missed events, e.g. directory moves
+WORKSPACE_FULL_SCAN_INTERVAL = float(os.getenv("WORKSPACE_FULL_SCAN_INTERVAL", "30"))
+
+class _WorkspaceEventHandler(FileSystemEventHandler):
+    """Collects changed paths under a task workspace for scan_and_sync_workspace to drain."""
+
+    def __init__(self, client: "HierarchicalClient"):
+        super().__init__()
+        self.client = client
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        paths = [event.src_path]
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            paths.append(dest_path)
+        with self.client._fs_events_lock:
+            self.client._fs_events.update(os.fsdecode(p) for p in paths)
+
+# One observer thread shared by every task workspace, started on first use
+_workspace_observer = None
+_workspace_observer_lock = threading.Lock()
+
+def get_workspace_observer():
+    global _workspace_observer
+    if Observer is None:
+        return None
+    with _workspace_observer_lock:
+        if _workspace_observer is None:
+            observer = Observer()
+            observer.daemon = True
+            observer.start()
+            _workspace_observer = observer
+        return _workspace_observer
 
 class HierarchicalClient:
     """增强版协调器，支持Flask集成和实时事件发送 [Contains Chinese - needs translation]"""
@@ -695,28 +1528,77 @@ class HierarchicalClient:
             'base_url': base_url
         }
         
-        # META和EXEC都使用相同的模型configuration，传入error回调
-        self.meta_llm = OpenAIBackend(model, api_key, base_url, error_callback=self.emit_llm_error)
-        self.exec_llm = OpenAIBackend(model, api_key, base_url, error_callback=self.emit_llm_error)
+        # META和EXEC都使用相同的模型configuration，传入error回调；共享同一个AsyncOpenAI连接池
+        llm_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        # The planner backend also serves the cheap "adapter" tier used to adapt cached plans
+        self.meta_llm = OpenAIBackend(model, api_key, base_url, error_callback=self.emit_llm_error, client=llm_client,
+                                      models={"adapter": PLAN_CACHE_ADAPT_MODEL})
+        self.exec_llm = OpenAIBackend(model, api_key, base_url, error_callback=self.emit_llm_error, client=llm_client)
         
         # English: 使用全局工具服务池，不再create自己的exit_stack和sessions
-        self.sessions: Dict[str, ClientSession] = global_tool_sessions  # English: 引用全局工具会话
-        self.shared_history: List[Dict[str, str]] = []
+        self.sessions: Dict[str, ClientSession] = global_tool_manager.sessions  # English: 引用全局工具会话
+        self._tools_attached = False
+        # Bounded: appending at the cap evicts the oldest message in O(1)
+        self.shared_history: Deque[Dict[str, str]] = collections.deque(maxlen=MAX_TURNS_MEMORY)
+        # Index of the latest assistant message in shared_history, kept in step by _add_to_history
+        self.last_assistant_idx: Optional[int] = None
         
         # Flask集成相关
         self.task_id = task_id
         self.workspace_dir = Path(workspace_dir)
         self.workspace_dir.mkdir(parents=True, exist_ok=True)
+        # Plain string paths for the per-file hot paths (save, sync) to join with os.path
+        self.workspace_str = str(self.workspace_dir)
+        self.workspace_subdir = os.path.join(self.workspace_str, "workspace")
         
         # create沙盒环境setup
         self._setup_sandbox()
         
         # English: 事件发送 - load现有消息计数
-        existing_messages = self._load_messages_from_file()
-        self.message_count = len(existing_messages)
-        self.files_created = {}
+        self.message_count = self._count_saved_messages()
+        # messages.jsonl stays open for the task's lifetime; writes are buffered and flushed on
+        # task_update / final_answer / error, before a replay (flush_messages) and on cleanup
+        self._messages_fp = None
+        self._messages_lock = threading.Lock()
+        # process_query's result files are written here instead of on the task's event loop;
+        # a single worker keeps writes to the same file in order
+        self._io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"io-{task_id}")
+        # Set while _execute_tool_calls runs a multi-call reply: tool results only request a sync
+        self._defer_workspace_sync = False
+        self._workspace_sync_pending = False
+        # tool_calls.jsonl, opened on the first tool call and only touched from _io_pool
+        self._tool_calls_fp = None
+        # (workspace file states, list_workspace_files output) from the last planner listing
+        self._workspace_listing: Optional[Tuple[Dict[str, Tuple[int, int]], str]] = None
+        # This task's TaskMessageQueue, resolved lazily if the client exists before its queue
+        self._task_queue: Optional[TaskMessageQueue] = task_queues.get(task_id)
+        # filename -> {'sha1', 'size', 'mtime'}; content stays on disk, see get_file_content()
+        self.files_created: Dict[str, dict] = {}
         self.todo_content = ""
+        # Specialized todo.md save path, built on the first save (see _build_todo_fastpath)
+        self._save_todo_fast = None
+        
+        # Pending file_update events, coalesced per filename and sent in batches from the shared loop
+        self._pending_file_updates: Dict[str, dict] = {}
+        self._pending_lock = threading.Lock()
+        # Held across sequence stamping, queue put and messages.jsonl write, and across a whole
+        # pop-and-send of pending file updates, so the task thread and the shared loop cannot
+        # interleave: stream, file and sequence numbers keep one order. Reentrant because
+        # _send_message flushes pending file updates first. Lock order: _send_lock, then _pending_lock.
+        self._send_lock = threading.RLock()
+        self._flush_scheduled = False
+        self.dropped_file_updates = 0
         self.run_control_file = self.workspace_dir / "_run"
+        # In-memory mirror of _run: set while running. The file is read once here and kept as the
+        # persisted copy; pause/resume go through set_run_state, so _wait_if_paused never polls it
+        self._run_event = asyncio.Event()
+        self._task_loop: Optional[asyncio.AbstractEventLoop] = None
+        try:
+            paused = self.run_control_file.read_text(encoding='utf-8').strip() == '0'
+        except OSError:
+            paused = False
+        if not paused:
+            self._run_event.set()
         
         # English: 缓存管理
         self.base_cache_dir = str(self.workspace_dir)
@@ -724,24 +1606,51 @@ class HierarchicalClient:
         
         logger.info(f"Initialized client for task {task_id}, loaded {self.message_count} existing messages")
         
-        # filestatus监控
-        self.workspace_file_states = {}
+        # filestatus监控: relative path -> (size, mtime_ns); size catches rewrites when mtimes are pinned
+        self.workspace_file_states: Dict[str, Tuple[int, int]] = {}
+        self._fs_events: set = set()
+        self._fs_events_lock = threading.Lock()
+        self._fs_watch = self._start_workspace_watch()
         self._initial_sync_file_states()
 
+    def _start_workspace_watch(self):
+        """Watch workspace/ for changes when watchdog is installed; None means fall back to full scans."""
+        observer = get_workspace_observer()
+        if observer is None:
+            return None
+        try:
+            return observer.schedule(_WorkspaceEventHandler(self), self.workspace_subdir, recursive=True)
+        except Exception as e:
+            logger.warning(f"Workspace watcher unavailable for task {self.task_id}, using full scans: {e}")
+            return None
+
+    def _stat_workspace_files(self) -> Dict[str, Tuple[int, int]]:
+        """Walk workspace/ and return {relative path: (size, mtime_ns)}."""
+        files_dir = self.workspace_subdir
+        prefix_len = len(files_dir) + 1
+        current_files = {}
+        # scandir walk: DirEntry carries the file type (and on Windows the stat) from readdir itself
+        pending = [files_dir]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(entry.path)
+                            elif entry.is_file():
+                                st = entry.stat()
+                                current_files[entry.path[prefix_len:]] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return current_files
+
     def _initial_sync_file_states(self):
         """Synchronously scans the workspace for the initial file state."""
-        self.workspace_file_states = {}
-        files_dir = self.workspace_dir / "workspace"
-        if not files_dir.exists():
-            return
-        for root, _, files in os.walk(files_dir):
-            for name in files:
-                file_path = Path(root) / name
-                relative_path = str(file_path.relative_to(files_dir))
-                try:
-                    self.workspace_file_states[relative_path] = file_path.stat().st_mtime
-                except OSError:
-                    continue
+        self.workspace_file_states = self._stat_workspace_files()
+        self._last_full_scan = time.monotonic()
         logger.info(f"Initial file state for task {self.task_id} synced, {len(self.workspace_file_states)} files found.")
 
     def _setup_sandbox(self):
@@ -755,35 +1664,111 @@ class HierarchicalClient:
         os.environ["AGENT_WORKSPACE"] = str(self.workspace_dir)
         os.environ["AGENT_CACHE_DIR"] = str(self.workspace_dir / "cache")
         
+    def _build_todo_fastpath(self):
+        """Bind the todo.md autosave path once per task; save_file calls it on every save."""
+        shared_history = self.shared_history
+        task_id = self.task_id
+
+        def _save_todo_fast(content: str):
+            # 1. Update shared history right away so the next planner turn sees the edit
+            idx = self.last_assistant_idx
+            if idx is not None and shared_history[idx]['role'] == 'assistant':
+                if shared_history[idx]['content'] != content:
+                    shared_history[idx]['content'] = content
+            else:
+                # If no assistant message found, append it. This might happen in edge cases.
+                self._add_to_history('assistant', content)
+                logger.warning(f"No prior assistant message in history for task {task_id}. Appended new todo.md.")
+            # 2. Write to disk and emit the file update once the burst of saves settles
+            schedule_file_save(self, 'todo.md', content)
+
+        self._save_todo_fast = _save_todo_fast
+        return _save_todo_fast
+
     def _send_message(self, msg_type: str, data: dict):
         """发送消息到frontend队列并save到file [Contains Chinese - needs translation]"""
-        message = {
-            "type": msg_type,
-            "data": data,
-            "sequence": self.message_count,
-            "timestamp": time.time()
-        }
-        
-        # save到file
-        self._save_message_to_file(message)
-        
-        # English: 发送到内存队列（如果存在）
-        if self.task_id in task_queues:
-            task_queues[self.task_id].put(message)
+        with self._send_lock:
+            # Any other event first flushes queued file updates so the stream keeps its order
+            if msg_type != "file_update" and self._pending_file_updates:
+                self.flush_file_updates()
+            
+            message = {
+                "type": msg_type,
+                "data": data,
+                "sequence": self.message_count,
+                "timestamp": time.time()
+            }
+            
+            # English: 发送到内存队列（如果存在）；队列创建后不会被替换，解析一次后缓存引用
+            task_queue = self._task_queue
+            if task_queue is None:
+                task_queue = self._task_queue = task_queues.get(self.task_id)
+            # Serialize once: the queue's JSON line is also the messages.jsonl record, so a
+            # large file_update is not escaped a second time for the file
+            if task_queue is not None:
+                line = task_queue.put(message)
+            else:
+                line = _serialize_to_json_bytes(message) + b'\n'
             
-        self.message_count += 1
-        logger.info(f"发送并save消息: {msg_type}, 任务: {self.task_id}")
+            # save到file
+            self._save_message_to_file(line, msg_type)
+                
+            self.message_count += 1
+        # Per-message: lazy %-args so nothing is formatted when INFO is disabled
+        logger.info("Sent and saved message: %s, task: %s", msg_type, self.task_id)
 
-    def _save_message_to_file(self, message: dict):
+    def _save_message_to_file(self, line: bytes, msg_type: str):
         """save消息到JSONfile [Contains Chinese - needs translation]"""
         try:
-            messages_file = self.workspace_dir / "messages.jsonl"
-            # English: 使用JSONL格式，每行一个JSON对象
-            with open(messages_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(message, ensure_ascii=False) + '\n')
+            # English: 使用JSONL格式，每行一个JSON对象（已序列化的UTF-8行）
+            with self._messages_lock:
+                if self._messages_fp is None:
+                    self._messages_fp = open(self.workspace_dir / "messages.jsonl", 'ab', buffering=1 << 16)
+                self._messages_fp.write(line)
+                if msg_type in MESSAGE_FLUSH_TYPES:
+                    self._messages_fp.flush()
         except Exception as e:
             logger.error(f"Error saving message to file: {e}")
 
+    def flush_messages(self, close: bool = False):
+        """Push buffered messages.jsonl lines to disk, e.g. before the file is replayed."""
+        with self._messages_lock:
+            if self._messages_fp is None:
+                return
+            try:
+                if close:
+                    self._messages_fp.close()
+                    self._messages_fp = None
+                else:
+                    self._messages_fp.flush()
+            except Exception as e:
+                logger.error(f"Error flushing messages file: {e}")
+
+    def _count_saved_messages(self) -> int:
+        """Count messages.jsonl records by newlines; one JSON object per line, no parsing needed."""
+        count = 0
+        try:
+            with open(self.workspace_dir / "messages.jsonl", 'rb') as f:
+                while chunk := f.read(1 << 20):
+                    count += chunk.count(b'\n')
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error counting messages in file: {e}")
+        return count
+
+    async def _write_task_file(self, path, content):
+        """Write str/bytes to path on the client's I/O thread."""
+        writer = write_bytes_file if isinstance(content, bytes) else write_text_file
+        await asyncio.get_running_loop().run_in_executor(self._io_pool, writer, path, content)
+
+    def _append_tool_call(self, line: bytes):
+        """Append one tool call record to tool_calls.jsonl (runs on the client's I/O thread)."""
+        if self._tool_calls_fp is None:
+            self._tool_calls_fp = open(self.workspace_dir / "tool_calls.jsonl", 'ab')
+        self._tool_calls_fp.write(line)
+        self._tool_calls_fp.flush()
+
     def _load_messages_from_file(self) -> List[dict]:
         """从fileload所有消息 [Contains Chinese - needs translation]"""
         try:
@@ -828,52 +1813,110 @@ class HierarchicalClient:
         }
         self._send_message("activity_update", update_data)
 
-    def emit_file_update(self, filename: str, content: str, is_url: bool = False):
-        """发送fileupdate [Contains Chinese - needs translation]"""
+    def emit_file_update(self, filename: str, content: str, is_url: bool = False, on_disk: bool = False):
+        """发送fileupdate [Contains Chinese - needs translation]
+
+        on_disk: content is what the workspace file already holds (read by a scan or written by a
+        tool), so it is not written back.
+        """
+        digest = hashlib.sha1(content.encode("utf-8", "replace")).hexdigest()
+        file_path = os.path.join(self.workspace_subdir, filename)
+        
+        # Autosave often sends back exactly what we already have; skip the write and the broadcast
+        previous = self.files_created.get(filename)
+        if (previous is not None and previous["sha1"] == digest and previous["is_url"] == is_url
+                and (is_url or on_disk or os.path.exists(file_path))):
+            return
+        
         # savefile到workspace/workspace
-        if not is_url:
-            file_path = self.workspace_dir / "workspace" / filename
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            try:
-                file_path.write_text(content, encoding="utf-8")
-            except Exception:
-                file_path.write_bytes(content.encode('utf-8', errors='ignore'))
+        if not is_url and not on_disk:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            write_text_file(file_path, content)
         
-        self.files_created[filename] = content
+        self.files_created[filename] = {
+            "sha1": digest,
+            "size": len(content),
+            "mtime": time.time(),
+            "is_url": is_url,
+        }
         
         file_data = {
             "filename": filename,
             "content": content,
             "is_url": is_url,
             "is_editable": is_editable_file(filename),
-            "file_type": self._detect_file_type(filename),
+            "file_type": detect_file_type(filename),
             "content_mode": "url" if is_url else "text"
         }
         
-        self._send_message("file_update", file_data)
+        # Queue the event; a later update of the same file replaces this one before it is sent
+        with self._pending_lock:
+            self._pending_file_updates[filename] = file_data
+            if len(self._pending_file_updates) > MAX_PENDING_FILE_UPDATES:
+                evicted = next(iter(self._pending_file_updates))
+                del self._pending_file_updates[evicted]
+                # Forget its hash and scan state so the next emit or scan of that file sends it again
+                self.files_created.pop(evicted, None)
+                self.workspace_file_states.pop(evicted, None)
+                self.dropped_file_updates += 1
+            schedule = not self._flush_scheduled
+            self._flush_scheduled = True
+        if schedule:
+            shared_loop.call_soon_threadsafe(self._flush_file_update_batch)
+
+    def _flush_file_update_batch(self):
+        """Send up to BROADCAST_BATCH_SIZE queued file updates, yielding the shared loop between batches."""
+        with self._send_lock:
+            with self._pending_lock:
+                batch = []
+                while self._pending_file_updates and len(batch) < BROADCAST_BATCH_SIZE:
+                    filename = next(iter(self._pending_file_updates))
+                    batch.append(self._pending_file_updates.pop(filename))
+                more = bool(self._pending_file_updates)
+                if not more:
+                    self._flush_scheduled = False
+            self._send_file_updates(batch)
+        if more:
+            shared_loop.call_soon(self._flush_file_update_batch)
+
+    def flush_file_updates(self):
+        """Synchronously send every queued file update."""
+        with self._send_lock:
+            with self._pending_lock:
+                batch = list(self._pending_file_updates.values())
+                self._pending_file_updates.clear()
+            self._send_file_updates(batch)
+
+    def _send_file_updates(self, batch: List[dict]):
+        for file_data in batch:
+            self._send_message("file_update", file_data)
+        with self._pending_lock:
+            dropped, self.dropped_file_updates = self.dropped_file_updates, 0
+        if dropped:
+            logger.warning(f"Dropped {dropped} queued file updates for task {self.task_id}")
+            self._send_message("file_update_dropped", {"dropped": dropped})
+
+    def get_file_content(self, filename: str) -> Optional[str]:
+        """Read a saved workspace file back from disk; None for URL-mode or missing files."""
+        info = self.files_created.get(filename)
+        if info is not None and info.get("is_url"):
+            return None
+        try:
+            with open(os.path.join(self.workspace_subdir, filename), "rb") as f:
+                return f.read().decode("utf-8", "replace")
+        except OSError:
+            return None
 
     def _detect_file_type(self, filename: str) -> str:
         """检测fileclass型 [Contains Chinese - needs translation]"""
-        file_ext = Path(filename).suffix.lower()
-        
-        if file_ext in {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg', '.ico'}:
-            return 'image'
-        elif file_ext in {'.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'}:
-            return 'video'
-        elif file_ext == '.pdf':
-            return 'pdf'
-        elif file_ext == '.html':
-            return 'html'
-        elif file_ext == '.md':
-            return 'markdown'
-        elif file_ext in {'.mp3', '.wav', '.aac', '.ogg', '.m4a'}:
-            return 'audio'
-        else:
-            return 'text'
+        return detect_file_type(filename)
 
     def emit_terminal_output(self, command: str, output: str, status: str = "completed"):
         """发送终端output [Contains Chinese - needs translation]"""
-        output = 'Output:'.join(output.split('Output:')[1:])
+        # Keep what follows the first 'Output:' marker; output without one (e.g. errors) is sent as-is
+        _, marker, tail = output.partition('Output:')
+        if marker:
+            output = tail
         terminal_data = {
             "command": command,
             "output": output,
@@ -920,23 +1963,40 @@ class HierarchicalClient:
         # English: 发送fileupdate
         self.emit_file_update("todo.md", plan_data)
 
+    def _send_plan_preview(self, plan_data: str):
+        """Send an in-progress todo.md to the frontend without saving it or recording it in files_created."""
+        self._send_message("file_update", {
+            "filename": "todo.md",
+            "content": plan_data,
+            "is_url": False,
+            "is_editable": is_editable_file("todo.md"),
+            "file_type": detect_file_type("todo.md"),
+            "content_mode": "text"
+        })
+
+    def set_run_state(self, running: bool):
+        """Pause or resume the task from any thread; also persists the state to the _run file."""
+        self.run_control_file.write_text('1' if running else '0', encoding='utf-8')
+        update = self._run_event.set if running else self._run_event.clear
+        loop = self._task_loop
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if loop is None or on_loop or loop.is_closed():
+            update()
+        else:
+            loop.call_soon_threadsafe(update)
+
     async def _wait_if_paused(self):
-        """Checks the _run file and pauses execution if it's set to '0'."""
-        is_paused = False
-        # Ensure the control file exists
-        if not self.run_control_file.exists():
-            self.run_control_file.write_text('1', encoding='utf-8')
-
-        while self.run_control_file.read_text(encoding='utf-8').strip() == '0':
-            if not is_paused:
-                self.emit_task_update("paused")
-                is_paused = True
-                logger.info(f"Task {self.task_id} is paused.")
-            await asyncio.sleep(1)  # Check every second
-
-        if is_paused:
-            self.emit_task_update("running")
-            logger.info(f"Task {self.task_id} is resumed.")
+        """Waits while the task is paused (set_run_state(False))."""
+        if self._run_event.is_set():
+            return
+        self.emit_task_update("paused")
+        logger.info(f"Task {self.task_id} is paused.")
+        await self._run_event.wait()
+        self.emit_task_update("running")
+        logger.info(f"Task {self.task_id} is resumed.")
 
     # English: 保持原有method不变
     def _create_new_task_cache(self) -> str:
@@ -946,10 +2006,14 @@ class HierarchicalClient:
         return str(self.workspace_dir)
 
     def _add_to_history(self, role: str, content: str):
-        """Append a message and trim history when over cap."""
-        self.shared_history.append({"role": role, "content": content})
-        if len(self.shared_history) > MAX_TURNS_MEMORY:
-            self.shared_history.pop(0)
+        """Append a message; at the cap the deque drops the oldest one."""
+        history = self.shared_history
+        if len(history) == history.maxlen and self.last_assistant_idx is not None:
+            # the append below evicts history[0]
+            self.last_assistant_idx = self.last_assistant_idx - 1 if self.last_assistant_idx > 0 else None
+        history.append({"role": role, "content": content})
+        if role == "assistant":
+            self.last_assistant_idx = len(history) - 1
 
     def connect_to_global_tools(self):
         """连接到全局工具服务池 [Contains Chinese - needs translation]"""
@@ -957,16 +2021,21 @@ class HierarchicalClient:
             raise RuntimeError("Global tool service pool not initialized, please start tool service first")
         
         # update工作区环境variable
-        os.environ["AGENT_CACHE_DIR"] = str(self.workspace_dir)
-        os.environ["AGENT_WORKSPACE"] = str(self.workspace_dir)
+        os.environ["AGENT_CACHE_DIR"] = self.workspace_str
+        os.environ["AGENT_WORKSPACE"] = self.workspace_str
+        
+        # English: 引用共享会话，每个client只计一次
+        if not self._tools_attached:
+            self.sessions = global_tool_manager.acquire()
+            self._tools_attached = True
         
         # get可用工具info
-        tools_info = global_tool_manager.get_tools_info()
+        tools_info = get_global_tools_info()
         logger.info(f"任务 {self.task_id} 连接到global tool pool，可用工具: {tools_info['tool_names']}")
         
         return tools_info['tool_names']
 
-    async def _tools_schema(self) -> List[Dict[str, Any]]:
+    async def _tools_schema(self) -> tuple:
         """返回全局工具schema [Contains Chinese - needs translation]"""
         return global_tool_manager.tools_schema
     
@@ -975,35 +2044,34 @@ class HierarchicalClient:
         try:
             return global_tool_manager.call_tool_sync(tool_name, args)
         except Exception as e:
-            error_msg = f"Tool {tool_name} call failed: {str(e)}"
-            logger.error(error_msg)
-            
-            # Send error to frontend
-            try:
-                self.emit_error(error_msg, "tool_manager_error", tool_name=tool_name, tool_args=args)
-            except Exception as emit_error:
-                logger.error(f"发送tool managererror到frontendfailed: {emit_error}")
-            
+            self._report_tool_error(tool_name, args, e)
             raise
     
     async def call_tool_async(self, tool_name: str, args: dict):
         """异步工具调用包装器，在execute器中使用 [Contains Chinese - needs translation]"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        
-        # English: 在当前线程中run同步调用
-        return await loop.run_in_executor(
-            None, 
-            self.call_tool_safe, 
-            tool_name, 
-            args
-        )
+        # English: 直接await tool manager的future，不再占用线程池线程阻塞等待
+        try:
+            return await global_tool_manager.call_tool_async(tool_name, args)
+        except Exception as e:
+            self._report_tool_error(tool_name, args, e)
+            raise
+    
+    def _report_tool_error(self, tool_name: str, args: dict, e: Exception):
+        error_msg = f"Tool {tool_name} call failed: {str(e)}"
+        logger.error(error_msg)
+        
+        # Send error to frontend
+        try:
+            self.emit_error(error_msg, "tool_manager_error", tool_name=tool_name, tool_args=args)
+        except Exception as emit_error:
+            logger.error(f"发送tool managererror到frontendfailed: {emit_error}")
 
     async def process_query(self, query: str, uploaded_files: Optional[List[str]] = None) -> str:
         """增强版查询process，支持事件发送 [Contains Chinese - needs translation]"""
         try:
-            # Create the run control file and set to running
-            self.run_control_file.write_text('1', encoding='utf-8')
+            # Create the run control file and set to running; pause/resume are delivered to this loop
+            self._task_loop = asyncio.get_running_loop()
+            self.set_run_state(True)
 
             # English: 发送任务startstatus
             self.emit_task_update("started")
@@ -1036,28 +2104,23 @@ Status: 🟡 In Progress
             
             # save初始查询
             query_file = self.workspace_dir / "query.txt"
-            query_file.write_text(str(query), encoding="utf-8")
+            await self._write_task_file(query_file, str(query))
             
             # saveAPIconfiguration到file
             api_config_file = self.workspace_dir / "api_config.json"
             try:
-                api_config_file.write_text(json.dumps(self.api_config, indent=2, ensure_ascii=False), encoding="utf-8")
+                await self._write_task_file(api_config_file, json.dumps(self.api_config, indent=2, ensure_ascii=False))
             except Exception as e:
                 logger.warning(f"Failed to save API config for task {self.task_id}: {e}")
             
             tools_schema = await self._tools_schema()
-            # English: 简化工具info显示
-            tool_names = [tool['function']['name'] for tool in tools_schema]
-            logger.info(f"Available tools: {tool_names}")
+            # English: 简化工具info显示（工具名列表随tools_version缓存）
+            tool_names = get_global_tools_info()['tool_names']
+            logger.info("Available tools: %s", tool_names)
 
 
-            # English: 为META-PLANNER准备系统提示
-            system_prompt = META_SYSTEM_PROMPT
-
-            if tool_names:
-                system_prompt += f"\n\n---\n***\n---\n\nThe EXECUTOR has the following tools available: {tool_names}. "
-                system_prompt += "During the planning process, please simultaneously consider the potential uses of these tools and provide corresponding guidance. "
-                system_prompt += "However, please note that tools other than these are not provided/available. Therefore, instructing the EXECUTOR to use additional tools is not permitted."
+            # English: 为META-PLANNER准备上下文（系统提示保持静态，上下文作为user消息附在历史之后）
+            tools_context = get_planner_tools_context()
             # Always try to list the workspace structure
             files_context = ""
             list_files_tool_name = "list_workspace_files"
@@ -1066,13 +2129,11 @@ Status: 🟡 In Progress
                 session = self.sessions[list_files_tool_name]
                 try:
                     activity_id = self.emit_activity(f"Listing workspace files via {list_files_tool_name}...", "command", command=f"{list_files_tool_name}()")
-                    args = {"task_cache_dir": str(self.workspace_dir)} # Provide the workspace directory
+                    args = {"task_cache_dir": self.workspace_str} # Provide the workspace directory
                     log_block(f"AUTO TOOL CALL ({list_files_tool_name})", args)
                     
-                    result_msg = await self.call_tool_async(list_files_tool_name, args)
-                    
                     # The result is now a pre-formatted string from the tool
-                    file_list_str = result_msg.content[0].text
+                    file_list_str = await self._list_workspace_files(list_files_tool_name, args)
 
                     log_block(f"AUTO TOOL RESULT ({list_files_tool_name})", file_list_str)
                     
@@ -1082,26 +2143,29 @@ Status: 🟡 In Progress
                         files_context += "Here is the current workspace structure:\n"
                     
                     files_context += file_list_str
-                    files_context += "\n\nThis is the end of the file list. Now, consider the user's request and the provided files to create a plan.\n\n"
-                    system_prompt = files_context + META_SYSTEM_PROMPT
+                    files_context += "\n\nThis is the end of the file list. Now, consider the user's request and the provided files to create a plan."
                     
                     self.emit_activity_update(activity_id, "completed")
                 except Exception as e:
                     logger.error(f"Failed to auto-list workspace files with {list_files_tool_name}: {e}")
                     # Fallback if the tool fails
                     if uploaded_files:
-                        system_prompt = f"The user has uploaded the following files to the 'upload_files' directory: {', '.join(uploaded_files)}. Please proceed with the plan.\n\n" + META_SYSTEM_PROMPT
+                        files_context = f"The user has uploaded the following files to the 'upload_files' directory: {', '.join(uploaded_files)}. Please proceed with the plan."
 
             # English: 添加用户消息到历史
             self._add_to_history("user", query)
-            log_block("META‑SYSTEM", system_prompt)
+            planning_context = "\n\n".join(part for part in (files_context, tools_context) if part)
+            log_block("META‑CONTEXT", planning_context)
             # English: 元规划器消息
-            planner_msgs = [{"role": "system", "content": system_prompt}] + self.shared_history
+            planner_msgs = self._planner_messages(planning_context)
             log_block("META‑PLANNER INPUT (cycle 0)", query)
 
             
             # initializemeta_contentvariable，防止未定义error
             meta_content = ""
+            # Plan cache: goals with uploaded files depend on those files, so they always get a fresh plan
+            cache = get_plan_cache() if not uploaded_files else None
+            goal_embedding = None
 
             for cycle in range(self.MAX_CYCLES):
                 # Check for pause signal before each cycle
@@ -1110,7 +2174,13 @@ Status: 🟡 In Progress
                 # English: 元规划器process
                 try:
                     planning_activity_id = self.emit_activity(f"🧠 Meta-Planner analyzing task (Cycle {cycle + 1})...", "planning")
-                    meta_reply = await self.meta_llm.chat(planner_msgs)
+                    meta_reply = None
+                    if cycle == 0 and cache is not None:
+                        goal_embedding, meta_reply = await self._plan_from_cache(cache, query)
+                    if meta_reply is None:
+                        meta_reply = await self._stream_plan(planner_msgs)
+                        if cycle == 0 and goal_embedding is not None and "FINAL ANSWER:" not in (meta_reply["content"] or ""):
+                            cache.add(query, goal_embedding, meta_reply["content"] or "")
                     meta_content = meta_reply["content"] or ""
                     self.emit_activity_update(planning_activity_id, "completed")
                     
@@ -1136,8 +2206,8 @@ Status: 🟡 In Progress
                     final_answer_text = meta_content.split("FINAL ANSWER:")[1]
                     self.emit_final_answer(final_answer_text)
 
-                    final_answer_file = self.workspace_dir / "final_answer.txt"
-                    final_answer_file.write_text(str(meta_content), encoding="utf-8")
+                    final_answer_file = os.path.join(self.workspace_str, "final_answer.txt")
+                    await self._write_task_file(final_answer_file, str(meta_content))
                     
                     # updatetodo.md为completestatus
 
@@ -1153,9 +2223,9 @@ Status: 🟡 In Progress
                     self.update_todo_md(meta_content)
                     
                     # save计划
-                    plan_file = self.workspace_dir / f"plan_cycle_{cycle}.md"
+                    plan_file = os.path.join(self.workspace_str, f"plan_cycle_{cycle}.md")
 
-                    plan_file.write_text(meta_content, encoding="utf-8")
+                    await self._write_task_file(plan_file, meta_content)
                     
                 except Exception as e:
                     error_msg = f"[planner error] {e}: {meta_content}"
@@ -1166,11 +2236,7 @@ Status: 🟡 In Progress
 
 
                 # execute器消息
-                exec_msgs = (
-                    [{"role": "system", "content": EXEC_SYSTEM_PROMPT}]
-                    + self.shared_history
-                    + [{"role": "user", "content": meta_content}]
-                )
+                exec_msgs = [EXEC_SYS_MSG, *self.shared_history, {"role": "user", "content": meta_content}]
 
                 while True:
                     # Check for pause signal before each executor action
@@ -1202,8 +2268,8 @@ Status: 🟡 In Progress
                         self._add_to_history("user", f"EXEC AGENT: Task result: {result_text}")
                         
                         # save任务result
-                        task_result_file = self.workspace_dir / f"task_result.txt"
-                        task_result_file.write_text(str(result_text), encoding="utf-8")
+                        task_result_file = os.path.join(self.workspace_str, "task_result.txt")
+                        await self._write_task_file(task_result_file, str(result_text))
                         
                         # updatetodo.mdcompletestatus
 
@@ -1215,129 +2281,13 @@ Status: 🟡 In Progress
                         log_block("NO RESPONSE", "Executor returned neither content nor tool calls")
                         break
 
-                    for call in tool_calls:
-                        t_name = call["function"]["name"]
-                        try:
-                            # English: 更安全的parameter解析
-                            raw_args = call["function"].get("arguments") or "{}"
-                            if isinstance(raw_args, str):
-                                t_args = json.loads(raw_args)
-                            else:
-                                t_args = raw_args
-                        except json.JSONDecodeError as e:
-                            error_msg = f"Failed to parse arguments for {t_name}: {raw_args}, error: {e}"
-                            log_block("TOOL CALL PARSE ERROR", error_msg)
-                            # English: 尝试修复常见的JSON问题
-                            try:
-                                # English: 移除可能的额外反斜杠或修复引号
-                                fixed_args = raw_args.replace('\\"', '"').replace("\\n", "\n")
-                                t_args = json.loads(fixed_args)
-                                log_block("TOOL CALL PARSE FIXED", f"Successfully fixed arguments: {t_args}")
-                            except:
-                                # English: 如果仍然failed，使用空parameter
-                                t_args = {}
-                                log_block("TOOL CALL FALLBACK", f"Using empty arguments for {t_name}")
-                        
-                        # English: 注入workspacepath到工具parameter
-                        if "task_cache_dir" not in t_args:
-                            t_args["task_cache_dir"] = str(self.workspace_dir)
-                        if "workspace" not in t_args:
-                            t_args["workspace"] = str(self.workspace_dir)
-                        
-                        log_block(
-                            f"EXECUTOR → TOOL CALL ({t_name})",
-                            _serialize_for_json(t_args)
-                        )
-                        
-                        # English: 发送工具调用活动
-                        tool_activity_id = self.emit_activity(f"Calling tool: {t_name}", "command", 
-                                                            command=f"{t_name}({json.dumps(t_args, ensure_ascii=False)})")
-
-                        try:
-                            session = self.sessions[t_name]
-                            
-                            # English: 确保parameter格式正确 - 深度序列化process
-                            clean_args = {}
-                            for key, value in t_args.items():
-                                # English: 确保parameter值是JSON可序列化的
-                                if isinstance(value, (str, int, float, bool, type(None))):
-                                    clean_args[key] = value
-                                elif isinstance(value, (list, dict)):
-                                    # English: 对复杂对象进行序列化
-                                    try:
-                                        clean_args[key] = _serialize_for_json(value)
-                                    except:
-                                        clean_args[key] = str(value)
-                                else:
-                                    # English: 其他class型转换为字符串
-                                    clean_args[key] = str(value)
-                            
-                            result_msg = await self.call_tool_async(t_name, clean_args)
-                            
-                            log_block(f"TOOL RESULT ({t_name})", result_msg.content)
-
-                            # process不同工具的result
-                            await self._handle_tool_result(t_name, clean_args, result_msg, clean_args)
-                            
-                            # complete工具调用
-                            self.emit_activity_update(tool_activity_id, "completed")
-                            
-                            # save工具调用记录
-                            tool_call_file = self.workspace_dir / f"tool_call_{t_name}_{cycle}.json"
-                            tool_call_data = {
-                                "tool_name": str(t_name),
-                                "original_arguments": _serialize_for_json(t_args),
-                                "cleaned_arguments": clean_args,
-                                "result": str(result_msg.content),
-                                "timestamp": datetime.datetime.now().isoformat()
-                            }
-                            try:
-                                tool_call_file.write_text(json.dumps(tool_call_data, indent=2, ensure_ascii=False), encoding="utf-8")
-                            except Exception as e:
-                                logger.error(f"Failed to save tool call: {e}")
-
-                            # English: 反馈到execute器对话
-                            exec_msgs.append({
-                                "role": "assistant",
-                                "content": "",
-                                "tool_calls": [call],
-                            })
-                            exec_msgs.append({
-                                "role": "tool",
-                                "tool_call_id": call["id"],
-                                "name": t_name,
-                                "content": result_msg.content,
-                            })
-                            
-                        except Exception as e:
-                            error_msg = f"Tool {t_name} call failed: {str(e)}"
-                            log_block(f"TOOL ERROR ({t_name})", error_msg)
-                            logger.error(error_msg)
-                            
-                            # English: 发送详细errorinfo到frontend
-                            self.emit_error(
-                                error_msg, 
-                                "tool_call_error", 
-                                tool_name=t_name, 
-                                tool_args=clean_args,
-                                cycle=cycle
-                            )
-                            
-                            # update活动status为failed
-                            self.emit_activity_update(tool_activity_id, "failed", error=str(e))
-                            
-                            # English: 向LLM反馈error
-                            exec_msgs.append({
-                                "role": "assistant",
-                                "content": "",
-                                "tool_calls": [call],
-                            })
-                            exec_msgs.append({
-                                "role": "tool",
-                                "tool_call_id": call["id"],
-                                "name": t_name,
-                                "content": f"Error: {str(e)}",
-                            })
+                    # English: result按模型给出的顺序反馈
+                    if len(tool_calls) == 1:
+                        results = [await self._execute_tool_call(tool_calls[0], cycle)]
+                    else:
+                        results = await self._execute_tool_calls(tool_calls, cycle)
+                    for messages in results:
+                        exec_msgs.extend(messages)
 
                 files_context = ""
                 list_files_tool_name = "list_workspace_files"
@@ -1345,11 +2295,9 @@ Status: 🟡 In Progress
                 if list_files_tool_name in self.sessions:
                     session = self.sessions[list_files_tool_name]
                     try:
-                        args = {"task_cache_dir": str(self.workspace_dir)} # Provide the workspace directory
-                        result_msg = await self.call_tool_async(list_files_tool_name, args)
-                        
-                        # The result is now a pre-formatted string from the tool
-                        file_list_str = result_msg.content[0].text
+                        args = {"task_cache_dir": self.workspace_str} # Provide the workspace directory
+                        # The result is now a pre-formatted string from the tool; reused while workspace/ is unchanged
+                        file_list_str = await self._list_workspace_files(list_files_tool_name, args)
                         
                         files_context += "Here is the current workspace structure:\n"
                         
@@ -1360,13 +2308,11 @@ Status: 🟡 In Progress
                         # Fallback if the tool fails
 
                 # English: 准备下一轮规划
-                planner_msgs = (
-                    [{"role": "system", "content": META_SYSTEM_PROMPT + files_context}] + self.shared_history
-                )
+                planner_msgs = self._planner_messages(files_context)
                 
                 log_block(
                     f"META‑PLANNER INPUT (cycle {cycle + 1})",
-                    "\n".join(m["content"] for m in self.shared_history[-6:])  # show tail only
+                    "\n".join(m["content"] for m in itertools.islice(self.shared_history, max(len(self.shared_history) - 6, 0), None))  # show tail only
                 )
 
             # English: 超出最大循环次数
@@ -1386,12 +2332,253 @@ Status: 🟡 In Progress
             # saveerror到file
             try:
                 error_file = self.workspace_dir / "error.txt"
-                error_file.write_text(f"任务executeerror:\n{error_msg}\n\n详细info:\n{str(e)}", encoding="utf-8")
+                await self._write_task_file(error_file, f"任务executeerror:\n{error_msg}\n\n详细info:\n{str(e)}")
             except Exception as save_error:
                 logger.error(f"saveerrorinfofailed: {save_error}")
             
             raise
 
+    async def _list_workspace_files(self, tool_name: str, args: Dict[str, Any]) -> str:
+        """Call the workspace listing tool, or reuse its last output if no file's (size, mtime_ns) changed."""
+        state = await asyncio.get_running_loop().run_in_executor(self._io_pool, self._stat_workspace_files)
+        if self._workspace_listing is not None and self._workspace_listing[0] == state:
+            return self._workspace_listing[1]
+        result_msg = await self.call_tool_async(tool_name, args)
+        file_list_str = result_msg.content[0].text
+        self._workspace_listing = (state, file_list_str)
+        return file_list_str
+
+    def _planner_messages(self, context: str) -> List[Dict[str, Any]]:
+        """Static META system message, then the shared history, then this turn's context (if any)."""
+        msgs = [META_SYS_MSG, *self.shared_history]
+        if context:
+            msgs.append({"role": "user", "content": context})
+        return msgs
+
+    async def _execute_tool_calls(self, tool_calls: List[Dict[str, Any]], cycle: int) -> List[List[Dict[str, Any]]]:
+        """Run one reply's tool calls in model order; consecutive read-only (CACHEABLE_TOOLS) calls run concurrently.
+
+        Side-effecting calls (writes, code, terminal) run one at a time so a write is never
+        overtaken by the call that uses it. Workspace syncs requested by the calls are
+        deferred to a single sync after the batch.
+        """
+        semaphore = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
+
+        async def run_guarded(call):
+            async with semaphore:
+                return await self._execute_tool_call(call, cycle)
+
+        results: List[List[Dict[str, Any]]] = []
+        self._defer_workspace_sync = True
+        try:
+            i = 0
+            while i < len(tool_calls):
+                j = i
+                while j < len(tool_calls) and tool_calls[j]["function"]["name"] in CACHEABLE_TOOLS:
+                    j += 1
+                if j > i:
+                    results.extend(await asyncio.gather(*(run_guarded(call) for call in tool_calls[i:j])))
+                    i = j
+                else:
+                    results.append(await self._execute_tool_call(tool_calls[i], cycle))
+                    i += 1
+        finally:
+            self._defer_workspace_sync = False
+            if self._workspace_sync_pending:
+                self._workspace_sync_pending = False
+                await self.scan_and_sync_workspace()
+        return results
+
+    async def _sync_workspace_after_tool(self):
+        """Sync the workspace now, or once after the current tool batch."""
+        if self._defer_workspace_sync:
+            self._workspace_sync_pending = True
+        else:
+            await self.scan_and_sync_workspace()
+
+    async def _execute_tool_call(self, call: Dict[str, Any], cycle: int) -> List[Dict[str, Any]]:
+        """Run one executor tool call and return the assistant/tool message pair to feed back."""
+        messages: List[Dict[str, Any]] = []
+        t_name = call["function"]["name"]
+        try:
+            # English: 更安全的parameter解析
+            raw_args = call["function"].get("arguments") or "{}"
+            if isinstance(raw_args, str):
+                t_args = json.loads(raw_args)
+            else:
+                t_args = raw_args
+        except json.JSONDecodeError as e:
+            error_msg = f"Failed to parse arguments for {t_name}: {raw_args}, error: {e}"
+            log_block("TOOL CALL PARSE ERROR", error_msg)
+            # English: 尝试修复常见的JSON问题
+            try:
+                # English: 移除可能的额外反斜杠或修复引号
+                fixed_args = raw_args.replace('\\"', '"').replace("\\n", "\n")
+                t_args = json.loads(fixed_args)
+                log_block("TOOL CALL PARSE FIXED", f"Successfully fixed arguments: {t_args}")
+            except:
+                # English: 如果仍然failed，使用空parameter
+                t_args = {}
+                log_block("TOOL CALL FALLBACK", f"Using empty arguments for {t_name}")
+        
+        # English: 注入workspacepath到工具parameter
+        t_args.setdefault("task_cache_dir", self.workspace_str)
+        t_args.setdefault("workspace", self.workspace_str)
+        
+        log_block(
+            f"EXECUTOR → TOOL CALL ({t_name})",
+            t_args
+        )
+        
+        # English: 发送工具调用活动
+        tool_activity_id = self.emit_activity(f"Calling tool: {t_name}", "command", 
+                                            command=f"{t_name}({_serialize_to_json_bytes(t_args).decode()})")
+
+        clean_args: Dict[str, Any] = {}
+        try:
+            # Reject unknown tools before cleaning arguments or reaching the tool manager
+            if t_name not in self.sessions:
+                raise RuntimeError(f"工具 '{t_name}' 不存在")
+            
+            # English: 确保parameter格式正确 - 深度序列化process
+            for key, value in t_args.items():
+                # English: 确保parameter值是JSON可序列化的
+                if isinstance(value, (str, int, float, bool, type(None))):
+                    clean_args[key] = value
+                elif isinstance(value, (list, dict)):
+                    # English: 对复杂对象进行序列化
+                    try:
+                        clean_args[key] = _serialize_for_json(value)
+                    except:
+                        clean_args[key] = str(value)
+                else:
+                    # English: 其他class型转换为字符串
+                    clean_args[key] = str(value)
+            
+            result_msg = await self.call_tool_async(t_name, clean_args)
+            
+            log_block(f"TOOL RESULT ({t_name})", result_msg.content)
+
+            # process不同工具的result
+            await self._handle_tool_result(t_name, clean_args, result_msg, clean_args)
+            
+            # complete工具调用
+            self.emit_activity_update(tool_activity_id, "completed")
+            
+            # save工具调用记录: one line per call in tool_calls.jsonl; cleaned_arguments only when they differ
+            tool_call_data = {
+                "tool_name": str(t_name),
+                "cycle": cycle,
+                "original_arguments": t_args,
+                "result": str(result_msg.content),
+                "timestamp": time.time()
+            }
+            if clean_args != t_args:
+                tool_call_data["cleaned_arguments"] = clean_args
+            try:
+                line = _serialize_to_json_bytes(tool_call_data) + b'\n'
+                await asyncio.get_running_loop().run_in_executor(self._io_pool, self._append_tool_call, line)
+            except Exception as e:
+                logger.error(f"Failed to save tool call: {e}")
+
+            # English: 反馈到execute器对话
+            messages.append({
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [call],
+            })
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "name": t_name,
+                "content": result_msg.content,
+            })
+            
+        except Exception as e:
+            error_msg = f"Tool {t_name} call failed: {str(e)}"
+            log_block(f"TOOL ERROR ({t_name})", error_msg)
+            logger.error(error_msg)
+            
+            # English: 发送详细errorinfo到frontend
+            self.emit_error(
+                error_msg, 
+                "tool_call_error", 
+                tool_name=t_name, 
+                tool_args=clean_args,
+                cycle=cycle
+            )
+            
+            # update活动status为failed
+            self.emit_activity_update(tool_activity_id, "failed", error=str(e))
+            
+            # English: 向LLM反馈error
+            messages.append({
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [call],
+            })
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "name": t_name,
+                "content": f"Error: {str(e)}",
+            })
+        return messages
+
+    async def _stream_plan(self, planner_msgs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run the planner with streaming and return the reply in chat()'s shape.
+
+        When checklist lines complete, the partial TODO.md is pushed to the frontend
+        (at most every PLAN_STREAM_PUSH_INTERVAL seconds) so the plan shows up while the
+        rest is still being generated. Nothing is written to disk here; the caller saves
+        the finished plan with update_todo_md().
+        """
+        parts = []
+        pending = ""
+        last_push = 0.0
+        async for delta in self.meta_llm.chat_stream(planner_msgs):
+            parts.append(delta)
+            pending += delta
+            if "\n" not in pending:
+                continue
+            lines = pending.split("\n")
+            pending = lines.pop()
+            if time.monotonic() - last_push < PLAN_STREAM_PUSH_INTERVAL:
+                continue
+            if any(_TODO_ITEM_RE.match(line) for line in lines):
+                partial = "".join(parts)
+                partial = partial[:len(partial) - len(pending)]
+                if "FINAL ANSWER:" not in partial:
+                    self._send_plan_preview(partial)
+                    last_push = time.monotonic()
+        return {"content": "".join(parts), "tool_calls": None}
+
+    async def _plan_from_cache(self, cache: PlanCache, query: str):
+        """Embed the goal and, on a cache hit, adapt the cached TODO.md with the cheap model.
+
+        Returns (embedding, reply); reply is None on a miss so the full planner runs.
+        """
+        try:
+            embedding = await self.meta_llm.embed(query, PLAN_CACHE_EMBED_MODEL)
+        except Exception as e:
+            logger.warning(f"Plan cache embedding failed for task {self.task_id}: {e}")
+            return None, None
+        template = cache.lookup(embedding)
+        if template is None:
+            return embedding, None
+        log_block("PLAN CACHE HIT", template)
+        try:
+            reply = await self.meta_llm.chat([
+                {"role": "system", "content": PLAN_ADAPT_PROMPT},
+                {"role": "user", "content": f"New goal:\n{query}\n\nCached TODO.md template:\n{template}"},
+            ], tier="adapter")
+        except Exception as e:
+            logger.warning(f"Plan adaptation failed for task {self.task_id}, running full planner: {e}")
+            return None, None
+        if not reply["content"]:
+            return None, None
+        return None, reply
+
     async def _handle_tool_result(self, tool_name: str, args: dict, result_msg, clean_args: dict = None):
         """process不同工具的result，发送相应的事件 [Contains Chinese - needs translation]"""
         
@@ -1402,7 +2589,7 @@ Status: 🟡 In Progress
  
             # English: 提取搜索result并转换为JSON字符串
             search_results = [i.text for i in result_msg.content]
-            formatted_content = json.dumps(search_results, indent=2, ensure_ascii=False)
+            formatted_content = _serialize_to_json_bytes(search_results, indent=True).decode("utf-8")
             log_block("SEARCH TOOL RESULT WITH JSON", formatted_content)
             self.emit_file_update(search_filename, formatted_content)
             
@@ -1418,7 +2605,7 @@ Status: 🟡 In Progress
             content = result_msg.content[0].text
             command = clean_args.get("command", "") if clean_args else args.get("command", "")
             self.emit_terminal_output(command, content)
-            await self.scan_and_sync_workspace()
+            await self._sync_workspace_after_tool()
             
         elif tool_name == "write_workspace_file":
             # filewrite工具：同时发送filecontent到frontend
@@ -1430,7 +2617,7 @@ Status: 🟡 In Progress
             if content.startswith("✅ File OVERWRITTEN:") or content.startswith("✅ File CREATED:"):
                 # English: 发送filecontent到frontend
                 if filename and file_content:
-                    self.emit_file_update(filename, file_content)
+                    self.emit_file_update(filename, file_content, on_disk=True)
             
         elif tool_name == "video_tool":
             content = str(result_msg.content)
@@ -1462,7 +2649,7 @@ Status: 🟡 In Progress
             # file工具：check是否create了新file
             if "created" in content.lower() or "saved" in content.lower():
                 # English: 扫描workspace查找新file
-                await self.scan_and_sync_workspace()
+                await self._sync_workspace_after_tool()
         else:
             content = str(result_msg.content)
             # English: 其他工具：发送一般活动status
@@ -1476,6 +2663,8 @@ Status: 🟡 In Progress
 
     def emit_file_deleted(self, filename: str):
         """Sends a file deletion event."""
+        # Forget the sent hash so a recreated file with the same content is sent again
+        self.files_created.pop(filename, None)
         delete_data = {"filename": filename}
         self._send_message("file_delete", delete_data)
 
@@ -1504,39 +2693,92 @@ Status: 🟡 In Progress
         except Exception as e:
             logger.error(f"Error scanning files: {e}")
 
+    async def _emit_workspace_files(self, changed: List[Tuple[str, str]]):
+        """Emit updates for (filename, path) pairs; text files are read concurrently off the event loop."""
+        if not changed:
+            return
+        loop = asyncio.get_running_loop()
+        # the default executor's worker count bounds how many files are open at once
+        reads = [None if should_use_url_mode(filename) else loop.run_in_executor(None, _read_text_file, file_path)
+                 for filename, file_path in changed]
+        contents = iter(await asyncio.gather(*(r for r in reads if r is not None), return_exceptions=True))
+        for (filename, _), read in zip(changed, reads):
+            try:
+                if read is None:
+                    file_url = f"/api/file_load/{self.task_id}/{filename}"
+                    self.emit_file_update(filename, file_url, is_url=True)
+                    continue
+                content = next(contents)
+                if isinstance(content, BaseException):
+                    raise content
+                self.emit_file_update(filename, content, on_disk=True)
+            except Exception as e:
+                logger.error(f"Error reading file for sync {filename}: {e}")
+
     async def scan_and_sync_workspace(self):
-        """Scans the workspace, compares with the stored state, and emits updates."""
+        """Emits updates for changed workspace files, from watcher events or a full rescan."""
+        if self._fs_watch is None:
+            return await self._full_scan_and_sync_workspace()
+
+        with self._fs_events_lock:
+            changed, self._fs_events = self._fs_events, set()
+        if time.monotonic() - self._last_full_scan >= WORKSPACE_FULL_SCAN_INTERVAL:
+            # Safety net; the full scan also covers the events just drained
+            return await self._full_scan_and_sync_workspace()
+        # Watcher paths are normally built on the scheduled workspace_subdir, so the relative
+        # name is a prefix slice; anything else goes through relpath
+        files_dir = self.workspace_subdir
+        prefix = os.path.join(files_dir, "")
+        prefix_len = len(prefix)
+        to_emit = []
+        deleted = False
+        for file_path in changed:
+            if file_path.startswith(prefix):
+                filename = file_path[prefix_len:]
+            else:
+                try:
+                    filename = os.path.relpath(file_path, files_dir)
+                except ValueError:
+                    continue
+                if filename == os.pardir or filename.startswith(os.pardir + os.sep):
+                    continue
+                file_path = os.path.join(files_dir, filename)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                if self.workspace_file_states.pop(filename, None) is not None:
+                    logger.info(f"Detected deleted file: {filename}")
+                    self.emit_file_deleted(filename)
+                    deleted = True
+                continue
+            state = (st.st_size, st.st_mtime_ns)
+            if self.workspace_file_states.get(filename) != state:
+                logger.info(f"Detected new/modified file: {filename}")
+                self.workspace_file_states[filename] = state
+                to_emit.append((filename, file_path))
+        if to_emit or deleted:
+            # Cached read_workspace_file/list_workspace_files results may predate these changes
+            global_tool_manager.invalidate_cache()
+        await self._emit_workspace_files(to_emit)
+
+    async def _full_scan_and_sync_workspace(self):
+        """Walks the whole workspace, compares with the stored state, and emits updates."""
         logger.info(f"Scanning workspace for task {self.task_id} for file changes.")
-        current_files = {}
-        files_dir = self.workspace_dir / "workspace"
-        
-        if files_dir.exists():
-            for root, _, files in os.walk(files_dir):
-                for name in files:
-                    file_path = Path(root) / name
-                    relative_path = str(file_path.relative_to(files_dir))
-                    try:
-                        current_files[relative_path] = file_path.stat().st_mtime
-                    except OSError:
-                        continue
+        current_files = await asyncio.get_running_loop().run_in_executor(None, self._stat_workspace_files)
+        self._last_full_scan = time.monotonic()
 
         # English: 查找新file和修改过的file
-        for filename, mtime in current_files.items():
-            if filename not in self.workspace_file_states or self.workspace_file_states[filename] < mtime:
+        to_emit = []
+        for filename, state in current_files.items():
+            if self.workspace_file_states.get(filename) != state:
                 logger.info(f"Detected new/modified file: {filename}")
-                file_path = files_dir / filename
-                try:
-                    if should_use_url_mode(filename):
-                        file_url = f"/api/file_load/{self.task_id}/{filename}"
-                        self.emit_file_update(filename, file_url, is_url=True)
-                    else:
-                        content = file_path.read_text(encoding="utf-8", errors="ignore")
-                        self.emit_file_update(filename, content)
-                except Exception as e:
-                    logger.error(f"Error reading file for sync {filename}: {e}")
+                to_emit.append((filename, os.path.join(self.workspace_subdir, filename)))
+        await self._emit_workspace_files(to_emit)
 
         # English: 查找delete的file
         deleted_files = set(self.workspace_file_states.keys()) - set(current_files.keys())
+        if to_emit or deleted_files:
+            global_tool_manager.invalidate_cache()
         for filename in deleted_files:
             logger.info(f"Detected deleted file: {filename}")
             self.emit_file_deleted(filename)
@@ -1547,6 +2789,20 @@ Status: 🟡 In Progress
 
     async def cleanup(self):
         """清理资源 - 使用global tool pool后不需要清理连接 [Contains Chinese - needs translation]"""
+        self.flush_messages(close=True)
+        self._io_pool.shutdown(wait=True)
+        if self._tool_calls_fp is not None:
+            self._tool_calls_fp.close()
+            self._tool_calls_fp = None
+        if self._fs_watch is not None:
+            try:
+                get_workspace_observer().unschedule(self._fs_watch)
+            except Exception:
+                pass
+            self._fs_watch = None
+        if self._tools_attached:
+            global_tool_manager.release()
+            self._tools_attached = False
         logger.info(f"任务 {self.task_id} 清理complete，global tool poolcontinuerun")
 
 # ==============================================================================
@@ -1563,7 +2819,11 @@ def create_task():
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
         return response
     try:
-        data = request.get_json()
+        # Multipart requests carry the JSON body in a 'payload' field and raw attachment bytes as file fields
+        if request.mimetype == 'multipart/form-data':
+            data = json.loads(request.form.get('payload', '{}'))
+        else:
+            data = request.get_json()
         prompt = data.get('prompt', '')
         attachments = data.get('attachments', [])
         api_config = data.get('api_config', {})
@@ -1596,69 +2856,92 @@ def create_task():
         if attachments:
             upload_dir = workspace_dir / "workspace" / "upload_files"
             upload_dir.mkdir(exist_ok=True, parents=True)
+            # Relative paths reported to the agent, built by plain concatenation
+            upload_prefix = "upload_files" + os.sep
             
             for attachment in attachments:
                 if isinstance(attachment, dict) and 'name' in attachment and 'content' in attachment:
                     filename = attachment['name']
-                    content_base64 = attachment['content']
                     
-                    if ',' in content_base64:
-                        content_base64 = content_base64.split(',', 1)[1]
+                    if attachment.get('encoding') == 'raw':
+                        # Raw attachment: 'content' names the multipart field holding the file bytes
+                        upload = request.files.get(attachment['content'])
+                        if upload is None:
+                            logger.error(f"Missing multipart field '{attachment['content']}' for file {filename}")
+                            continue
+                        if not filename.lower().endswith('.zip'):
+                            upload.save(str(upload_dir / filename))
+                            uploaded_files_list.append(upload_prefix + filename)
+                            continue
+                        file_bytes = upload.read()
+                    else:
+                        content_base64 = attachment['content']
+                        
+                        # Strip a data URI prefix; it always fits in the first 128 characters
+                        comma = content_base64.find(',', 0, 128)
+                        if comma != -1:
+                            content_base64 = content_base64[comma + 1:]
 
-                    try:
-                        file_bytes = base64.b64decode(content_base64)
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Failed to decode base64 for file {filename}: {e}")
-                        continue
+                        try:
+                            file_bytes = base64.b64decode(content_base64)
+                        except (ValueError, TypeError) as e:
+                            logger.error(f"Failed to decode base64 for file {filename}: {e}")
+                            continue
                     
                     if filename.lower().endswith('.zip'):
                         logger.info(f"Unzipping file: {filename} to {upload_dir}")
                         try:
                             with zipfile.ZipFile(io.BytesIO(file_bytes), 'r') as zip_ref:
+                                # To prevent path traversal, only members resolving inside upload_dir are extracted
+                                safe_root = upload_dir.resolve()
+                                safe_members = []
                                 for member in zip_ref.infolist():
-                                    if not member.is_dir():
-                                        # To prevent path traversal, we resolve the path
-                                        target_path = (upload_dir / member.filename).resolve()
-                                        if str(target_path).startswith(str(upload_dir.resolve())):
-                                            zip_ref.extract(member, upload_dir)
-                                            relative_member_path = Path("upload_files") / member.filename
-                                            uploaded_files_list.append(str(relative_member_path))
-                                        else:
-                                            logger.warning(f"Skipping potentially malicious zip member: {member.filename}")
+                                    if member.is_dir():
+                                        continue
+                                    # Path containment, not a string prefix: '../upload_files_x/...' must not pass
+                                    if (upload_dir / member.filename).resolve().is_relative_to(safe_root):
+                                        safe_members.append(member)
+                                    else:
+                                        logger.warning(f"Skipping potentially malicious zip member: {member.filename}")
+                                zip_ref.extractall(upload_dir, members=safe_members)
+                                uploaded_files_list.extend(upload_prefix + m.filename for m in safe_members)
                         except zipfile.BadZipFile:
                             logger.error(f"Bad zip file, saving as is: {filename}")
                             (upload_dir / filename).write_bytes(file_bytes)
-                            uploaded_files_list.append(str(Path("upload_files") / filename))
+                            uploaded_files_list.append(upload_prefix + filename)
                     else:
                         (upload_dir / filename).write_bytes(file_bytes)
-                        uploaded_files_list.append(str(Path("upload_files") / filename))
+                        uploaded_files_list.append(upload_prefix + filename)
 
         # create任务记录 - 立即setup为runningstatus
-        active_tasks[task_id] = {
-            'id': task_id,
-            'prompt': prompt,
-            'status': 'running',  # English: 改为runningstatus
-            'created_at': time.time(),
-            'workspace_dir': absolute_workspace_dir,
-            'uploaded_files': uploaded_files_list,
-            'api_config': {
-                'openai_api_key': openai_api_key,
-                'openai_base_url': openai_base_url,
-                'model': model
+        with tasks_lock:
+            active_tasks[task_id] = {
+                'id': task_id,
+                'prompt': prompt,
+                'status': 'running',  # English: 改为runningstatus
+                'created_at': time.time(),
+                'workspace_dir': absolute_workspace_dir,
+                'uploaded_files': uploaded_files_list,
+                'api_config': {
+                    'openai_api_key': openai_api_key,
+                    'openai_base_url': openai_base_url,
+                    'model': model
+                }
             }
-        }
 
-        # create消息队列
-        task_queues[task_id] = queue.Queue()
+            # create消息队列
+            task_queues[task_id] = TaskMessageQueue()
+            mark_tasks_changed()
 
         # English: 立即createclient并startexecute任务 - 确保原子性
         try:
             # checkglobal tool pool是否已initialize
-            if not tools_initialized:
+            if not global_tool_manager.initialized:
                 error_msg = "Global tool service pool not initialized, cannot create task"
                 logger.error(error_msg)
                 active_tasks[task_id]['status'] = 'failed'
                 active_tasks[task_id]['error'] = error_msg
+                mark_tasks_changed()
                 
                 # English: 发送error到队列
                 if task_id in task_queues:
@@ -1678,7 +2961,8 @@ def create_task():
             
             # createclient - 使用传入的APIconfiguration
             client = HierarchicalClient(model, openai_api_key, openai_base_url, task_id, str(workspace_dir))
-            task_clients[task_id] = client
+            with tasks_lock:
+                task_clients[task_id] = client
             
             # English: 在新线程中start任务execute
             def run_task():
@@ -1702,31 +2986,36 @@ def create_task():
                             logger.info(f"任务 {task_id} complete，result: {result[:100] if result else 'No result'}...")
                             
                             # save到历史
-                            completed_tasks_history[task_id] = {
-                                'task_id': task_id,
-                                'completed_at': time.time(),
-                                'final_result': result or 'Task failed',
-                                'files': dict(client.files_created) if hasattr(client, 'files_created') else {},
-                                'messages': []  # English: 消息已save在file中
-                            }
+                            with tasks_lock:
+                                completed_tasks_history[task_id] = {
+                                    'task_id': task_id,
+                                    'completed_at': time.time(),
+                                    'final_result': result or 'Task failed',
+                                    'files': dict(client.files_created) if hasattr(client, 'files_created') else {},
+                                    'messages': []  # English: 消息已save在file中
+                                }
                             
                         except Exception as e:
                             logger.error(f"任务 {task_id} executefailed: {e}")
                             # English: 确保即使failed也save到历史
-                            completed_tasks_history[task_id] = {
-                                'task_id': task_id,
-                                'completed_at': time.time(),
-                                'final_result': f'Error: {str(e)}',
-                                'files': dict(client.files_created) if hasattr(client, 'files_created') else {},
-                                'messages': []
-                            }
+                            with tasks_lock:
+                                completed_tasks_history[task_id] = {
+                                    'task_id': task_id,
+                                    'completed_at': time.time(),
+                                    'final_result': f'Error: {str(e)}',
+                                    'files': dict(client.files_created) if hasattr(client, 'files_created') else {},
+                                    'messages': []
+                                }
                             raise
                         
                         finally:
                             # English: 清理
-                            if task_id in active_tasks:
-                                del active_tasks[task_id]
-                            # English: 不需要清理全局工具连接
+                            flush_pending_writes(task_id)
+                            with tasks_lock:
+                                active_tasks.pop(task_id, None)
+                                mark_tasks_changed()
+                            # English: 释放对共享工具会话的引用（会话本身继续由全局池持有）
+                            await client.cleanup()
                     
                     loop.run_until_complete(execute())
                     
@@ -1775,6 +3064,7 @@ def create_task():
             error_msg = f"Failed to start task execution: {str(e)}"
             active_tasks[task_id]['status'] = 'failed'
             active_tasks[task_id]['error'] = error_msg
+            mark_tasks_changed()
             logger.error(f"Failed to start task {task_id}: {e}")
             
             # English: 发送error到队列
@@ -1837,21 +3127,26 @@ def connect_task(task_id):
         try:
             # check是否存在历史消息file
             messages_file = workspace_dir / "messages.jsonl"
+            client = task_clients.get(task_id)
+            if client is not None:
+                # English: 回放前先把缓冲中的消息写入file
+                client.flush_messages()
             
             if messages_file.exists():
                 # English: 回放历史消息
                 logger.info(f"Replaying messages from file for task {task_id}")
                 
-                with open(messages_file, 'r', encoding='utf-8') as f:
+                # Stored lines are already compact JSON; parse only to skip corrupt ones and replay the bytes as-is
+                loads = orjson.loads if orjson is not None else json.loads
+                with open(messages_file, 'rb') as f:
                     for line in f:
                         if line.strip():
                             try:
-                                message = json.loads(line)
-                                chunk = json.dumps(message) + '\n'
-                                yield chunk
-                                time.sleep(0.1)  # English: 控制回放速度
-                            except json.JSONDecodeError:
+                                loads(line)
+                            except ValueError:
                                 continue
+                            yield line if line.endswith(b'\n') else line + b'\n'
+                            time.sleep(0.1)  # English: 控制回放速度
                 
                 # check任务是否已complete
                 if task_id in completed_tasks_history or not (task_id in active_tasks or task_id in task_clients):
@@ -1869,25 +3164,29 @@ def connect_task(task_id):
                 task_queue = task_queues[task_id]
                 message_count = 0
                 
-                while True:
-                    try:
-                        message = task_queue.get(timeout=30)
-                        message_count += 1
-                        
-                        chunk = json.dumps(message) + '\n'
-                        yield chunk
-                        
-                        # check任务是否complete
-                        if (message.get('type') == 'task_update' and 
-                            message.get('data', {}).get('status') in ['completed', 'failed']):
-                            logger.info(f"Task {task_id} finished, sent {message_count} messages")
-                            break
-                            
-                    except queue.Empty:
+                task_finished = False
+                
+                while not task_finished:
+                    messages = task_queue.drain(timeout=30)
+                    if not messages:
                         # English: 发送心跳
                         heartbeat = json.dumps({'type': 'heartbeat', 'timestamp': time.time()}) + '\n'
                         yield heartbeat
                         continue
+                    
+                    # Everything drained goes out as one chunk (one write to the client) instead of one per message
+                    lines = []
+                    for line, finished in messages:
+                        message_count += 1
+                        lines.append(line)
+                        
+                        # check任务是否complete
+                        if finished:
+                            task_finished = True
+                            break
+                    yield b''.join(lines)
+                    if task_finished:
+                        logger.info(f"Task {task_id} finished, sent {message_count} messages")
             else:
                 # English: 没有活动任务，发送连接disable信号
                 final_message = {
@@ -2166,8 +3465,11 @@ def pause_task(task_id):
         return jsonify({'error': 'Task workspace not found'}), 404
 
     try:
-        run_file = workspace_dir / "_run"
-        run_file.write_text('0', encoding='utf-8')
+        client = task_clients.get(task_id)
+        if client is not None:
+            client.set_run_state(False)
+        else:
+            (workspace_dir / "_run").write_text('0', encoding='utf-8')
         logger.info(f"Task {task_id} paused by API request.")
         
         # Also send a message to the frontend queue if the task is active
@@ -2194,8 +3496,11 @@ def resume_task(task_id):
         return jsonify({'error': 'Task workspace not found'}), 404
 
     try:
-        run_file = workspace_dir / "_run"
-        run_file.write_text('1', encoding='utf-8')
+        client = task_clients.get(task_id)
+        if client is not None:
+            client.set_run_state(True)
+        else:
+            (workspace_dir / "_run").write_text('1', encoding='utf-8')
         logger.info(f"Task {task_id} resumed by API request.")
 
         # Also send a message to the frontend queue if the task is active
@@ -2207,6 +3512,70 @@ def resume_task(task_id):
         logger.error(f"Error resuming task {task_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _json_bytes(obj: Any) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, preferring orjson."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+# Debounced saves for active tasks: (task_id, filename) -> (client, latest content, pending timer)
+SAVE_DEBOUNCE_SECONDS = 0.1
+pending_writes: Dict[tuple, tuple] = {}
+pending_writes_lock = threading.Lock()
+
+def _flush_pending_write(key: tuple):
+    """Write the latest content for one pending save and notify the frontend once."""
+    with pending_writes_lock:
+        entry = pending_writes.pop(key, None)
+    if entry is None:
+        return
+    client, content, _ = entry
+    filename = key[1]
+    try:
+        # emit_file_update writes the file to the workspace before sending the event
+        client.emit_file_update(filename, content)
+        global_tool_manager.invalidate_cache()
+    except Exception as e:
+        logger.error(f"Error flushing debounced save of '{filename}' for task {client.task_id}: {e}")
+        try:
+            client.emit_error(f"File save failed: {str(e)}", "file_save_error", filename=filename)
+        except Exception as emit_error:
+            logger.error(f"发送filesaveerror到frontendfailed: {emit_error}")
+
+def schedule_file_save(client: 'HierarchicalClient', filename: str, content: str):
+    """Coalesce saves of the same file arriving within SAVE_DEBOUNCE_SECONDS into one write and one emit."""
+    key = (client.task_id, filename)
+    with pending_writes_lock:
+        entry = pending_writes.get(key)
+        if entry is not None:
+            entry[2].cancel()
+        timer = threading.Timer(SAVE_DEBOUNCE_SECONDS, _flush_pending_write, args=(key,))
+        timer.daemon = True
+        pending_writes[key] = (client, content, timer)
+        timer.start()
+
+def flush_pending_writes(task_id: Optional[str] = None):
+    """Immediately flush pending saves, for one task or for all tasks."""
+    with pending_writes_lock:
+        keys = [key for key in pending_writes if task_id is None or key[0] == task_id]
+        for key in keys:
+            pending_writes[key][2].cancel()
+    for key in keys:
+        _flush_pending_write(key)
+
+atexit.register(flush_pending_writes)
+
+# save-file response for todo.md; identical for every autosave, so serialized once
+_TODO_OK_BYTES = _json_bytes({
+    'success': True,
+    'message': '✅ todo.md saved and agent state updated.',
+    'filename': 'todo.md',
+    'method': 'agent_state_update'
+})
+# Other save-file responses only vary by filename; the JSON-encoded strings are spliced in
+_SAVE_OK_TEMPLATE = b'{"success":true,"message":%s,"filename":%s,"method":"direct_with_event"}'
+_DIRECT_SAVE_OK_TEMPLATE = b'{"success":true,"message":%s,"method":"direct_file_save"}'
+
 @app.route('/api/tasks/<task_id>/save-file', methods=['POST'])
 def save_file(task_id):
     """Saves file content, with special handling for todo.md to update agent state."""
@@ -2227,77 +3596,31 @@ def save_file(task_id):
                 return jsonify({'error': 'Task not found'}), 404
             
             try:
-                file_path = workspace_dir / "workspace" / filename
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                file_path.write_text(content, encoding="utf-8")
+                file_path = os.path.join(workspace_dir, "workspace", filename)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                write_text_file(file_path, content)
                 logger.info(f"File saved directly to inactive task workspace: {filename}")
-                return jsonify({
-                    'success': True,
-                    'message': f'✅ File saved directly: {filename}',
-                    'method': 'direct_file_save'
-                })
+                body = _DIRECT_SAVE_OK_TEMPLATE % _json_bytes(f'✅ File saved directly: {filename}')
+                return Response(body, mimetype='application/json')
             except Exception as e:
                 logger.error(f"Error saving file directly: {e}")
                 return jsonify({'success': False, 'message': f'Error saving file directly: {str(e)}'}), 500
 
         # --- Handle active task ---
-        workspace_dir = client.workspace_dir
-        
         # Special handling for todo.md to update agent state
         if filename == 'todo.md':
-            logger.info(f"Saving todo.md for task {task_id} and updating agent state.")
-            
-            # 1. Save file to disk
-            file_path = workspace_dir / "workspace" / "todo.md"
-            file_path.write_text(content, encoding='utf-8')
-
-            # 2. Update shared history
-            updated = False
-            for i in range(len(client.shared_history) - 1, -1, -1):
-                if client.shared_history[i]['role'] == 'assistant':
-                    logger.info(f"Found last assistant message to update in shared_history for task {task_id}.")
-                    client.shared_history[i]['content'] = content
-                    updated = True
-                    break
-            
-            if not updated:
-                 # If no assistant message found, append it. This might happen in edge cases.
-                client.shared_history.append({'role': 'assistant', 'content': content})
-                logger.warning(f"No prior assistant message in history for task {task_id}. Appended new todo.md.")
-
-
-            # 3. Emit file update to frontend to confirm save
-            client.emit_file_update(filename, content)
-
-            return jsonify({
-                'success': True,
-                'message': '✅ todo.md saved and agent state updated.',
-                'filename': filename,
-                'method': 'agent_state_update'
-            })
+            save_todo = client._save_todo_fast or client._build_todo_fastpath()
+            save_todo(content)
+            return Response(_TODO_OK_BYTES, status=202, mimetype='application/json')
 
         # --- Default handling for other files ---
         else:
             try:
-                file_path = workspace_dir / "workspace" / filename
-                file_path.parent.mkdir(parents=True, exist_ok=True)
+                # Write and notify the frontend once the burst of saves settles
+                schedule_file_save(client, filename, content)
                 
-                # Save file
-                try:
-                    file_path.write_text(content, encoding="utf-8")
-                except Exception:
-                    file_path.write_bytes(content.encode('utf-8', errors='ignore'))
-                
-                # Update client state and notify frontend
-                client.files_created[filename] = content
-                client.emit_file_update(filename, content)
-                
-                return jsonify({
-                    'success': True,
-                    'message': f'✅ File saved: {filename}',
-                    'filename': filename,
-                    'method': 'direct_with_event'
-                })
+                body = _SAVE_OK_TEMPLATE % (_json_bytes(f'✅ File saved: {filename}'), _json_bytes(filename))
+                return Response(body, status=202, mimetype='application/json')
                 
             except Exception as e:
                 logger.error(f"Error saving file '{filename}' directly for task {task_id}: {e}")
@@ -2337,42 +3660,86 @@ def get_task(task_id):
     else:
         return jsonify({'error': 'Task not found'}), 404
 
+def _etag_for(payload: bytes) -> str:
+    return '"' + hashlib.blake2b(payload, digest_size=8).hexdigest() + '"'
+
+def conditional_json(payload: bytes, etag: str):
+    """Answer 304 when the client already has this ETag, otherwise send the (gzipped) payload."""
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    response = Response(payload, mimetype='application/json')
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response.set_data(gzip.compress(payload, 1))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['ETag'] = etag
+    return response
+
+# (tasks_version, payload bytes, etag) for the last /api/tasks response
+_tasks_payload_cache: Optional[tuple] = None
+
+def _count_task_states() -> Dict[str, int]:
+    """Count auto-loaded/auto-paused/paused/running active tasks in a single pass."""
+    counts = {'auto_loaded': 0, 'auto_paused': 0, 'paused': 0, 'running': 0}
+    with tasks_lock:
+        for task in active_tasks.values():
+            if task.get('auto_loaded', False):
+                counts['auto_loaded'] += 1
+            if task.get('auto_paused', False):
+                counts['auto_paused'] += 1
+            status = task.get('status')
+            if status == 'paused':
+                counts['paused'] += 1
+            elif status == 'running':
+                counts['running'] += 1
+    return counts
+
 @app.route('/api/tasks')
 def list_tasks():
     """列出所有任务 [Contains Chinese - needs translation]"""
-    tasks_list = []
-    
-    # English: 添加活跃任务
-    for task in active_tasks.values():
-        task_info = task.copy()
-        task_info['category'] = 'active'
-        tasks_list.append(task_info)
+    global _tasks_payload_cache
     
-    # English: 添加已complete任务的摘要info
-    for task_id, task_data in completed_tasks_history.items():
-        task_info = {
-            'id': task_id,
-            'prompt': task_data.get('prompt', ''),
-            'status': task_data.get('final_status', 'completed'),
-            'completed_at': task_data.get('completed_at'),
-            'workspace_dir': task_data.get('workspace_dir', ''),
-            'category': 'completed',
-            'auto_loaded': True  # English: 历史任务都是自动load的
-        }
-        tasks_list.append(task_info)
+    with tasks_lock:
+        # Reuse the serialized listing while no task has changed since it was built
+        version = tasks_version
+        cached = _tasks_payload_cache
+        if cached is not None and cached[0] == version:
+            return conditional_json(cached[1], cached[2])
+        
+        # English: 添加活跃任务 (tasks_lock is reentrant, so the counts match this listing)
+        counts = _count_task_states()
+        tasks_list = [{**task, 'category': 'active'} for task in active_tasks.values()]
+        active_count = len(tasks_list)
+        
+        # English: 添加已complete任务的摘要info
+        tasks_list.extend(
+            {
+                'id': task_id,
+                'prompt': task_data.get('prompt', ''),
+                'status': task_data.get('final_status', 'completed'),
+                'completed_at': task_data.get('completed_at'),
+                'workspace_dir': task_data.get('workspace_dir', ''),
+                'category': 'completed',
+                'auto_loaded': True  # English: 历史任务都是自动load的
+            }
+            for task_id, task_data in completed_tasks_history.items()
+        )
     
-    return jsonify({
+    payload = _json_bytes({
         'tasks': tasks_list,
         'summary': {
             'total': len(tasks_list),
-            'active': len(active_tasks),
-            'completed': len(completed_tasks_history),
-            'auto_loaded': sum(1 for task in active_tasks.values() if task.get('auto_loaded', False)),
-            'auto_paused': sum(1 for task in active_tasks.values() if task.get('auto_paused', False)),
-            'paused_tasks': sum(1 for task in active_tasks.values() if task.get('status') == 'paused'),
-            'running_tasks': sum(1 for task in active_tasks.values() if task.get('status') == 'running')
+            'active': active_count,
+            'completed': len(tasks_list) - active_count,
+            'auto_loaded': counts['auto_loaded'],
+            'auto_paused': counts['auto_paused'],
+            'paused_tasks': counts['paused'],
+            'running_tasks': counts['running']
         }
     })
+    etag = _etag_for(payload)
+    _tasks_payload_cache = (version, payload, etag)
+    return conditional_json(payload, etag)
 
 @app.route('/api/health')
 def health_check():
@@ -2380,24 +3747,28 @@ def health_check():
     tools_info = get_global_tools_info()
     
     # English: 统计自动load的任务
-    auto_loaded_tasks = sum(1 for task in active_tasks.values() if task.get('auto_loaded', False))
-    auto_paused_tasks = sum(1 for task in active_tasks.values() if task.get('auto_paused', False))
+    counts = _count_task_states()
     
-    return jsonify({
+    health = {
         'status': 'healthy',
         'active_tasks': len(active_tasks),
         'running_clients': len(task_clients),
         'completed_tasks': len(completed_tasks_history),
-        'auto_loaded_tasks': auto_loaded_tasks,
-        'auto_paused_tasks': auto_paused_tasks,
+        'auto_loaded_tasks': counts['auto_loaded'],
+        'auto_paused_tasks': counts['auto_paused'],
         'tools_initialized': tools_info['initialized'],
         'available_tools': tools_info['tool_names'],
         'tools_count': tools_info['tools_count'],
-        'timestamp': time.time(),
+        'dropped_messages': {task_id: q.dropped for task_id, q in list(task_queues.items()) if q.dropped},
         'version': '3.3.0-auto-load-tasks',
         'architecture': 'Atomic task execution with auto-loading and auto-pausing of existing workspaces',
         'features': ['auto-task-loading', 'auto-pausing', 'pause-resume', 'todo-state-sync', 'global-tool-pool']
-    })
+    }
+    # The timestamp travels in a header so the body (and its ETag) only changes with the health itself
+    payload = _json_bytes(health)
+    response = conditional_json(payload, _etag_for(payload))
+    response.headers['X-Timestamp'] = str(time.time())
+    return response
 
 @app.route('/api/tools/status')
 def tools_status():
@@ -2407,8 +3778,9 @@ def tools_status():
         'initialized': tools_info['initialized'],
         'tools_count': tools_info['tools_count'],
         'tool_names': tools_info['tool_names'],
-        'global_sessions_count': len(global_tool_sessions),
-        'schema_count': len(global_tools_schema),
+        'global_sessions_count': len(global_tool_manager.sessions),
+        'attached_clients': global_tool_manager.client_refs,
+        'schema_count': len(global_tool_manager.tools_schema),
         'timestamp': time.time()
     })
 
@@ -2425,20 +3797,23 @@ def reload_workspaces():
     try:
         logger.info("🔄 手动重新load工作空间任务...")
         
-        # English: 记录load前的status
-        before_active = len(active_tasks)
-        before_completed = len(completed_tasks_history)
-        before_clients = len(task_clients)
-        before_auto_paused = sum(1 for task in active_tasks.values() if task.get('auto_paused', False))
+        # tasks_lock only around the counts; the load itself takes it just for registry updates
+        with tasks_lock:
+            # English: 记录load前的status
+            before_active = len(active_tasks)
+            before_completed = len(completed_tasks_history)
+            before_clients = len(task_clients)
+            before_auto_paused = _count_task_states()['auto_paused']
         
         # executeload
         load_existing_tasks_from_workspaces()
         
-        # English: 记录load后的status
-        after_active = len(active_tasks)
-        after_completed = len(completed_tasks_history)
-        after_clients = len(task_clients)
-        after_auto_paused = sum(1 for task in active_tasks.values() if task.get('auto_paused', False))
+        with tasks_lock:
+            # English: 记录load后的status
+            after_active = len(active_tasks)
+            after_completed = len(completed_tasks_history)
+            after_clients = len(task_clients)
+            after_auto_paused = _count_task_states()['auto_paused']
         
         # English: 计算新增数量
         new_active = after_active - before_active
@@ -2506,17 +3881,10 @@ def execute_terminal(task_id):
         if not global_tool_manager.initialized:
             return jsonify({'error': 'Global tool manager not initialized'}), 500
         
-        # English: 查找可用的终端execute工具
-        terminal_tool_name = None
-        available_tools = global_tool_manager.get_tools_info()['tool_names']
-        
-        # English: 按优先级查找终端工具
-        for tool_name in ['execute_terminal_command', 'terminal_command', 'shell_command']:
-            if tool_name in available_tools:
-                terminal_tool_name = tool_name
-                break
-                
+        # English: 终端工具在tool pool initialize时已按优先级解析
+        terminal_tool_name = global_tool_manager.resolved_terminal_tool
         if not terminal_tool_name:
+            available_tools = get_global_tools_info()['tool_names']
             return jsonify({'error': f'Terminal tool not available. Available tools: {available_tools}'}), 404
             
         logger.info(f"Using terminal tool '{terminal_tool_name}' for command: {command}")
@@ -2540,12 +3908,7 @@ def execute_terminal(task_id):
                 if hasattr(result_msg, 'content'):
                     if isinstance(result_msg.content, list):
                         # English: 如果content是列表，提取文本content
-                        output = ""
-                        for item in result_msg.content:
-                            if hasattr(item, 'text'):
-                                output += item.text
-                            else:
-                                output += str(item)
+                        output = "".join([item.text if hasattr(item, 'text') else str(item) for item in result_msg.content])
                     else:
                         output = str(result_msg.content)
                 else:
@@ -2585,10 +3948,9 @@ def execute_terminal(task_id):
                     "error": str(e)
                 }
         
-        # run异步命令
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(run_command())
+        # run异步命令 on the shared loop; the tool call itself times out after 5 minutes
+        future = asyncio.run_coroutine_threadsafe(run_command(), shared_loop)
+        result = future.result(timeout=330)
         
         return jsonify(result)
         
@@ -2645,6 +4007,60 @@ def get_available_servers():
 # English: 工作空间任务自动load功能
 # ==============================================================================
 
+WORKSPACE_LOAD_WORKERS = 32
+
+def _read_text_file(path: str) -> str:
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', 'ignore')
+
+@functools.lru_cache(maxsize=4096)
+def _load_api_config(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse api_config.json; keyed on mtime so unchanged configs are not reparsed on reload."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _load_one_task(task_dir: os.DirEntry) -> Optional[Dict[str, Any]]:
+    """Read one task directory's files (runs in a worker thread, touches no global state)."""
+    task_id = task_dir.name
+    query_path = os.path.join(task_dir.path, "query.txt")
+    
+    # read任务查询 - 缺少 query.txt 的directory不是有效任务
+    try:
+        task_prompt = _read_text_file(query_path).strip()
+    except FileNotFoundError:
+        logger.debug(f"跳过directory {task_id}：缺少 query.txt file")
+        return None
+    except Exception as e:
+        logger.warning(f"无法read任务 {task_id} 的查询file: {e}")
+        task_prompt = f"已load的任务 {task_id}"
+    
+    # check任务是否已complete
+    try:
+        completed_at = os.stat(os.path.join(task_dir.path, "final_answer.txt")).st_mtime
+    except OSError:
+        completed_at = None
+    
+    # English: 未complete的任务需要APIconfiguration
+    api_config_data = None
+    if completed_at is None:
+        api_config_path = os.path.join(task_dir.path, "api_config.json")
+        try:
+            api_config_data = _load_api_config(api_config_path, os.stat(api_config_path).st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"无法read任务 {task_id} 的APIconfiguration: {e}")
+    
+    return {
+        'task_id': task_id,
+        'task_dir': task_dir.path,
+        'prompt': task_prompt,
+        'completed_at': completed_at,
+        'api_config_data': api_config_data,
+        'dir_mtime': task_dir.stat().st_mtime,
+    }
+
 def load_existing_tasks_from_workspaces():
     """start时自动load workspaces directory中的所有现有任务 [Contains Chinese - needs translation]"""
     try:
@@ -2658,47 +4074,44 @@ def load_existing_tasks_from_workspaces():
         
         logger.info("🔍 扫描工作空间directoryload现有任务...")
         
-        # English: 扫描所有子directory，每个子directory代表一个任务
-        for task_dir in workspaces_dir.iterdir():
-            if not task_dir.is_dir():
+        # English: 扫描所有子directory，每个子directory代表一个任务; 跳过已经load的任务
+        with os.scandir(workspaces_dir) as it:
+            workspace_entries = [entry for entry in it if entry.is_dir()]
+        task_dirs = [
+            entry for entry in workspace_entries
+            if entry.name not in task_clients and entry.name not in active_tasks
+        ]
+        # Completed-task records persist across restarts; drop those whose workspace was removed
+        removed = completed_tasks_history.retain(entry.name for entry in workspace_entries)
+        if removed:
+            logger.info(f"Removed {removed} completed task records without a workspace")
+        
+        # Reading the task files is I/O bound, so fan it out; all registry mutations stay on this thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=WORKSPACE_LOAD_WORKERS) as executor:
+            futures = {executor.submit(_load_one_task, entry): entry.name for entry in task_dirs}
+            results = []
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"load任务 {futures[future]} failed: {e}")
+                    failed_count += 1
+        
+        for task_info in results:
+            if task_info is None:
                 continue
-                
-            task_id = task_dir.name
             
-            # English: 跳过已经load的任务
-            if task_id in task_clients or task_id in active_tasks:
-                continue
+            task_id = task_info['task_id']
+            task_dir = Path(task_info['task_dir'])
+            task_prompt = task_info['prompt']
             
             try:
-                # check是否是有效的任务directory（包含必要file）
-                query_file = task_dir / "query.txt"
-                if not query_file.exists():
-                    logger.debug(f"跳过directory {task_id}：缺少 query.txt file")
-                    continue
-                
-                # read任务查询
-                try:
-                    task_prompt = query_file.read_text(encoding='utf-8').strip()
-                except Exception as e:
-                    logger.warning(f"无法read任务 {task_id} 的查询file: {e}")
-                    task_prompt = f"已load的任务 {task_id}"
-                
-                # check任务是否已complete
-                final_answer_file = task_dir / "final_answer.txt"
-                is_completed = final_answer_file.exists()
-                
-                if is_completed:
-                    # English: 任务已complete，load到历史记录
-                    try:
-                        final_answer = final_answer_file.read_text(encoding='utf-8')
-                    except Exception:
-                        final_answer = "任务已complete"
-                    
+                if task_info['completed_at'] is not None:
                     # create历史记录条目
                     completed_tasks_history[task_id] = {
                         'task_id': task_id,
                         'prompt': task_prompt,
-                        'completed_at': final_answer_file.stat().st_mtime if final_answer_file.exists() else time.time(),
+                        'completed_at': task_info['completed_at'],
                         'final_status': 'completed',
                         'workspace_dir': str(task_dir.absolute()),
                         'executor_data': {
@@ -2713,20 +4126,14 @@ def load_existing_tasks_from_workspaces():
                     
                 else:
                     # English: 任务未complete，createclient实例
-                    # English: 尝试从filereadAPIconfiguration
-                    api_config_file = task_dir / "api_config.json"
                     api_config = None
-                    
-                    if api_config_file.exists():
-                        try:
-                            api_config_data = json.loads(api_config_file.read_text(encoding='utf-8'))
-                            api_config = {
-                                'model': api_config_data.get('model'),
-                                'api_key': api_config_data.get('api_key'),
-                                'base_url': api_config_data.get('base_url')
-                            }
-                        except Exception as e:
-                            logger.warning(f"无法read任务 {task_id} 的APIconfiguration: {e}")
+                    api_config_data = task_info['api_config_data']
+                    if api_config_data:
+                        api_config = {
+                            'model': api_config_data.get('model'),
+                            'api_key': api_config_data.get('api_key'),
+                            'base_url': api_config_data.get('base_url')
+                        }
                     
                     # English: 如果没有APIconfiguration，尝试使用环境variable作为fallback
                     if not api_config or not api_config.get('model') or not api_config.get('api_key'):
@@ -2754,27 +4161,14 @@ def load_existing_tasks_from_workspaces():
                         str(task_dir)
                     )
                     
-                    # English: 连接到global tool pool
-                    if global_tool_manager.initialized:
-                        try:
-                            connected_tools = client.connect_to_global_tools()
-                            logger.debug(f"任务 {task_id} 连接到 {len(connected_tools)} 个工具")
-                        except Exception as e:
-                            logger.warning(f"任务 {task_id} 连接工具池failed: {e}")
+                    # English: 重新load的任务处于pause，不在此连接工具池；执行时再通过connect_to_global_tools引用共享会话
                     
-                    # setup任务为pausestatus - 重新load的任务defaultpause
-                    client.run_control_file.write_text('0', encoding='utf-8')
-                    logger.info(f"任务 {task_id} 已setup为pausestatus（重新loaddefaultpause）")
-                    
-                    # English: 添加到全局字典
-                    task_clients[task_id] = client
-                    
-                    # create任务记录
-                    active_tasks[task_id] = {
+                    # English: 添加到全局字典; only the registry updates hold tasks_lock, the client is built outside it
+                    task_record = {
                         'id': task_id,
                         'prompt': task_prompt,
                         'status': 'paused',  # English: 标记为已load但pause
-                        'created_at': task_dir.stat().st_mtime,
+                        'created_at': task_info['dir_mtime'],
                         'workspace_dir': str(task_dir.absolute()),
                         'uploaded_files': [],
                         'auto_loaded': True,  # English: 标记为自动load
@@ -2785,10 +4179,23 @@ def load_existing_tasks_from_workspaces():
                             'model': api_config['model']
                         }
                     }
+                    with tasks_lock:
+                        registered = task_id not in task_clients and task_id not in active_tasks
+                        if registered:
+                            task_clients[task_id] = client
+                            # create任务记录
+                            active_tasks[task_id] = task_record
+                            # create消息队列
+                            if task_id not in task_queues:
+                                task_queues[task_id] = TaskMessageQueue()
+                    if not registered:
+                        # Registered concurrently (e.g. another reload); discard this client
+                        asyncio.run_coroutine_threadsafe(client.cleanup(), shared_loop).result()
+                        continue
                     
-                    # create消息队列
-                    if task_id not in task_queues:
-                        task_queues[task_id] = queue.Queue()
+                    # setup任务为pausestatus - 重新load的任务defaultpause
+                    client.set_run_state(False)
+                    logger.info(f"任务 {task_id} 已setup为pausestatus（重新loaddefaultpause）")
                     
                     logger.info(f"🔄 活跃任务load: {task_id}")
                 
@@ -2799,6 +4206,8 @@ def load_existing_tasks_from_workspaces():
                 failed_count += 1
                 continue
         
+        if loaded_count:
+            mark_tasks_changed()
         logger.info(f"✅ 任务loadcomplete: success {loaded_count} 个，failed {failed_count} 个")
         logger.info(f"📊 当前status: 活跃任务 {len(active_tasks)} 个，已complete任务 {len(completed_tasks_history)} 个")
         
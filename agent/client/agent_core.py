@@ -9,11 +9,11 @@ import argparse
 import asyncio
 import json
 import os
-import uuid
 import datetime
+import functools
 from contextlib import AsyncExitStack
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters
@@ -65,14 +65,49 @@ def log_block(title: str, content: str):
     border = "=" * len(title)
     print(f"\n{border}\n{title}\n{border}\n{content}\n")
 
+_FENCE_HEAD_RE = re.compile(r"^```[^\n]*\n")
+_FENCE_TAIL_RE = re.compile(r"\n?```$")
+
+@functools.lru_cache(maxsize=1024)
 def _strip_fences(text: str) -> str:
     text = text.strip()
     if text.startswith("```"):
-        text = re.sub(r"^```[^\n]*\n", "", text)
-        text = re.sub(r"\n?```$", "", text)
+        text = _FENCE_HEAD_RE.sub("", text)
+        text = _FENCE_TAIL_RE.sub("", text)
         return text.strip()
-    m = re.search(r"{[\\s\\S]*}", text)
-    return m.group(0) if m else text
+    obj = _extract_json_object(text)
+    return obj if obj is not None else text
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """Return the first balanced {...} in text, skipping braces inside JSON strings.
+
+    Single forward pass; if the object is never closed, falls back to the span
+    from the first '{' to the last '}'.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    end = text.rfind("}")
+    return text[start:end + 1] if end > start else None
 
 # ---------------------------------------------------------------------------
 #   Cache management utilities
@@ -99,12 +134,10 @@ def _serialize_for_json(obj: Any) -> Any:
 
 def create_task_cache_dir(base_cache_dir: str) -> str:
     """Create a unique cache directory for a new task."""
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    task_id = str(uuid.uuid4())[:8]
-    task_dir_name = f"task_{timestamp}_{task_id}"
-    task_cache_dir = Path(base_cache_dir) / task_dir_name
-    task_cache_dir.mkdir(parents=True, exist_ok=True)
-    return str(task_cache_dir)
+    # Nanosecond timestamp plus 32 random bits: sortable by creation time and unique under bursts
+    task_cache_dir = os.path.join(base_cache_dir, f"task_{time.time_ns()}_{os.urandom(4).hex()}")
+    os.makedirs(task_cache_dir, exist_ok=True)
+    return task_cache_dir
 
 # ---------------------------------------------------------------------------
 #   Minimal OpenAI backend wrapper (unchanged apart from import typing tweak)
@@ -62,6 +62,10 @@ from pathlib import Path
 from typing import Any, Dict, List, Literal, Optional, Set
 import hashlib
 import sys
+import atexit
+import collections
+import queue
+import threading
 
 from mcp.server.fastmcp import FastMCP
 
@@ -112,6 +116,13 @@ DEFAULT_IMPORT_WHITELIST = [
 #  Import whitelist validation functions
 # --------------------------------------------------------------------------- #
 
+# Regex fallback used by _extract_imports_from_code, compiled once
+_IMPORT_PATTERNS = (
+    re.compile(r'^\s*import\s+([a-zA-Z_][a-zA-Z0-9_]*)', re.MULTILINE),
+    re.compile(r'^\s*from\s+([a-zA-Z_][a-zA-Z0-9_]*)\s+import', re.MULTILINE),
+)
+
+
 def _extract_imports_from_code(code: str) -> Set[str]:
     """
     Extract all imported module names from Python code.
@@ -146,13 +157,8 @@ def _extract_imports_from_code(code: str) -> Set[str]:
         pass
     
     # Regex fallback for cases where AST parsing fails
-    import_patterns = [
-        r'^\s*import\s+([a-zA-Z_][a-zA-Z0-9_]*)',
-        r'^\s*from\s+([a-zA-Z_][a-zA-Z0-9_]*)\s+import',
-    ]
-    
-    for pattern in import_patterns:
-        matches = re.findall(pattern, code, re.MULTILINE)
+    for pattern in _IMPORT_PATTERNS:
+        matches = pattern.findall(code)
         for match in matches:
             imports.add(match.split('.')[0])
     
@@ -285,6 +291,76 @@ def _get_workspace_dir(task_cache_dir: Optional[str] = None) -> str:
     return str(workspace_dir)
 
 
+class _ArtifactWriter:
+    """
+    Background appender for non-critical artifacts (execution logs).
+    
+    Appends are queued and written by one daemon thread that keeps the target
+    files open (up to `max_open` descriptors), so tool coroutines never block on
+    log I/O. Call `drain()` to wait until everything queued has been written.
+    """
+
+    def __init__(self, max_open: int = 64):
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._fds: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._max_open = max_open
+        threading.Thread(target=self._run, name="artifact-writer", daemon=True).start()
+
+    def append(self, path: str, data: bytes) -> None:
+        self._queue.put((path, data))
+
+    def drain(self) -> None:
+        self._queue.join()
+
+    def _fd_for(self, path: str) -> int:
+        fd = self._fds.get(path)
+        if fd is not None:
+            self._fds.move_to_end(path)
+            return fd
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        self._fds[path] = fd
+        if len(self._fds) > self._max_open:
+            os.close(self._fds.popitem(last=False)[1])
+        return fd
+
+    def _run(self) -> None:
+        while True:
+            path, data = self._queue.get()
+            try:
+                os.write(self._fd_for(path), data)
+            except Exception as e:
+                logger.error(f"Failed to append to {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_artifact_writer = _ArtifactWriter()
+atexit.register(_artifact_writer.drain)
+
+# Files the agent treats as final deliverables; fsync them so a crash cannot lose them
+_CRITICAL_ARTIFACTS = {"result.html", "result.md"}
+
+
+def _write_workspace_bytes(file_path: Path, data: bytes, sync: bool = False) -> bool:
+    """
+    Write a workspace file (runs in a worker thread).
+    
+    Returns:
+        bool: Whether the file existed before the write
+    """
+    existed = file_path.exists()
+    fd = os.open(str(file_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if sync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    return existed
+
+
 def _log_execution(operation: str, details: dict, workspace_dir: str) -> None:
     """
     Log execution details for debugging and tracking.
@@ -302,9 +378,8 @@ def _log_execution(operation: str, details: dict, workspace_dir: str) -> None:
             "details": details
         }
         
-        log_file = Path(workspace_dir).parent / "execution.log"
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        log_file = os.path.join(os.path.dirname(workspace_dir), "execution.log")
+        _artifact_writer.append(log_file, (json.dumps(log_entry, ensure_ascii=False) + "\n").encode("utf-8"))
             
     except Exception as e:
         logger.error(f"Failed to log execution: {e}")
@@ -896,11 +971,16 @@ async def write_workspace_file(filename: str, content: str, task_cache_dir: str
         
     file_path = Path(workspace_dir) / normalized_filename
     
-    # Check if file exists
-    file_existed = file_path.exists()
-    
     try:
-        file_path.write_text(content, encoding="utf-8")
+        # Write off the event loop; final deliverables are fsynced before we report success.
+        # The writer needs no context variables, so skip to_thread's copy_context()/ctx.run wrapping
+        file_existed = await asyncio.get_running_loop().run_in_executor(
+            None,
+            _write_workspace_bytes,
+            file_path,
+            content.encode("utf-8"),
+            file_path.name.lower() in _CRITICAL_ARTIFACTS,
+        )
         
         # Log the operation
         _log_execution("write_workspace_file", {